@@ -0,0 +1,218 @@
+import ipaddress
+import logging
+import time
+
+import redis.asyncio as redis
+
+from typing import Iterable, Optional
+
+from app.dependencies.__config__ import settings
+from app.dependencies.__database__ import AsyncSessionLocal, SQLAlchemyError, select
+from app.dependencies.__redis__ import redis_manager
+
+from app.models.database.account import PublicIP, link_user_ips
+
+# Bumps the revision and records it as the user's latest change in one step, so a
+# worker that has seen a revision has also been able to see every change up to it.
+BUMP_SCRIPT = """
+local revision = redis.call('INCR', KEYS[1])
+for _, user_id in ipairs(ARGV) do
+    redis.call('ZADD', KEYS[2], revision, user_id)
+end
+return revision
+"""
+
+class AllowlistUnavailable(Exception):
+    """Raised when a user's allowlist cannot be read, so the request can be refused instead of let through."""
+
+class PrefixTrie:
+    """Binary trie of network prefixes; a lookup walks at most one node per prefix bit."""
+
+    __slots__ = ("root",)
+
+    def __init__(self):
+        # A node is [zero child, one child, whether a prefix ends here]
+        self.root = [None, None, False]
+
+    def add(self, network: ipaddress.IPv4Network | ipaddress.IPv6Network) -> None:
+        node = self.root
+        address = int(network.network_address)
+        for bit in range(network.max_prefixlen - 1, network.max_prefixlen - network.prefixlen - 1, -1):
+            branch = (address >> bit) & 1
+            if node[branch] is None:
+                node[branch] = [None, None, False]
+            node = node[branch]
+        node[2] = True
+
+    def contains(self, address: ipaddress.IPv4Address | ipaddress.IPv6Address) -> bool:
+        node = self.root
+        value = int(address)
+        for bit in range(address.max_prefixlen - 1, -1, -1):
+            if node[2]:
+                return True
+            node = node[(value >> bit) & 1]
+            if node is None:
+                return False
+        return node[2]
+
+class NetworkSet:
+    """The allowed networks of one user, with a trie per address family."""
+
+    __slots__ = ("v4", "v6")
+
+    def __init__(self, networks: Iterable[str]):
+        self.v4 = PrefixTrie()
+        self.v6 = PrefixTrie()
+        for network in networks:
+            try:
+                network = ipaddress.ip_network(network, strict=False)
+            except ValueError:
+                logging.warning(f"Ignoring invalid allowlist entry {network!r}")
+                continue
+            (self.v4 if network.version == 4 else self.v6).add(network)
+
+    def contains(self, ip: str) -> bool:
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        return (self.v4 if address.version == 4 else self.v6).contains(address)
+
+class IPAllowlist:
+    """Per-user source IP allowlists, answered from a per-worker index kept in sync with the database.
+
+    Users without any entry are unrestricted. Every change to a user's entries
+    bumps a revision counter in Redis and records the user in a sorted set
+    scored by that revision. Each worker checks the counter at most once per
+    ``sync_interval`` seconds and reloads only the users changed since the
+    revision it last saw. A message on ``CHANNEL`` makes the next check sync
+    right away, and a "full" message makes it reload everything.
+
+    Each worker also reloads everything at least every ``max_staleness``
+    seconds, so a change whose revision bump was lost is picked up in bounded
+    time. Until a full load has succeeded, users are checked against the
+    database one at a time and refused if that fails.
+    """
+
+    REVISION_KEY = "auth:allowlist:rev"
+    CHANGES_KEY = "auth:allowlist:changes"
+    CHANNEL = "auth:allowlist"
+
+    def __init__(self, sync_interval: float, max_staleness: float):
+        self.sync_interval = sync_interval
+        self.max_staleness = max_staleness
+        self.networks: dict[int, NetworkSet] = {}
+        self.revision = None
+        self.loaded = False
+        self.next_sync = 0.0
+        self.next_full_load = 0.0
+        self.script = None
+        self.full_loads = 0
+        self.partial_loads = 0
+
+    def handle_message(self, message: Optional[str]) -> None:
+        self.next_sync = 0.0
+        if message == "full":
+            self.next_full_load = 0.0
+
+    async def _load(self, user_ids: Optional[list[int]] = None) -> dict[int, list[str]]:
+        query = (
+            select(link_user_ips.c.user_id, PublicIP.ip_address)
+            .join(PublicIP, PublicIP.id == link_user_ips.c.public_ip_id)
+        )
+        if user_ids is not None:
+            query = query.where(link_user_ips.c.user_id.in_(user_ids))
+        entries = {user_id: [] for user_id in user_ids or ()}
+        async with AsyncSessionLocal() as db:
+            for user_id, ip_address in await db.execute(query):
+                entries.setdefault(user_id, []).append(ip_address)
+        return entries
+
+    def _apply(self, entries: dict[int, list[str]]) -> None:
+        for user_id, networks in entries.items():
+            if networks:
+                self.networks[user_id] = NetworkSet(networks)
+            else:
+                self.networks.pop(user_id, None)
+
+    async def sync(self) -> None:
+        """Reloads the users whose entries changed since the last sync, or everything when due."""
+        now = time.monotonic()
+        self.next_sync = now + self.sync_interval
+        full = self.revision is None or now >= self.next_full_load
+        try:
+            revision = int(await redis_manager.client.get(self.REVISION_KEY) or 0)
+            if revision == self.revision and not full:
+                return
+            changed = None
+            if not full and revision > self.revision:
+                changed = [int(user_id) for user_id in await redis_manager.client.zrangebyscore(self.CHANGES_KEY, f"({self.revision}", "+inf")]
+        except redis.RedisError as e:
+            if not full:
+                # Keep answering from the local index until Redis is back or a full reload is due
+                logging.warning(f"Failed to sync IP allowlists from Redis: {str(e)}")
+                return
+            revision, changed = None, None
+
+        try:
+            entries = await self._load(changed)
+        except SQLAlchemyError as e:
+            # The revision is left alone, so the next sync retries the same load
+            logging.warning(f"Failed to load IP allowlists from the database: {str(e)}")
+            return
+        if changed is None:
+            self.networks = {}
+            self.loaded = True
+            self.next_full_load = now + self.max_staleness
+            self.full_loads += 1
+        else:
+            self.partial_loads += 1
+        self._apply(entries)
+        self.revision = revision
+
+    async def changed(self, *user_ids: int) -> None:
+        """Records that the entries of these users changed in the database and tells every worker."""
+        self.next_sync = 0.0
+        try:
+            if self.script is None:
+                self.script = redis_manager.client.register_script(BUMP_SCRIPT)
+            await self.script(keys=[self.REVISION_KEY, self.CHANGES_KEY], args=list(user_ids))
+        except redis.RedisError as e:
+            # Other workers cannot see this change through the revision; ask them for a full reload,
+            # which max_staleness forces anyway should this message be lost too
+            logging.warning(f"Failed to record IP allowlist change in Redis: {str(e)}")
+            self.revision = None
+            await redis_manager.publish(self.CHANNEL, "full")
+            return
+        await redis_manager.publish(self.CHANNEL, "")
+
+    async def is_allowed(self, user_id: int, ip: str) -> bool:
+        """Whether the user may connect from this address; raises AllowlistUnavailable when that cannot be told."""
+        if time.monotonic() >= self.next_sync:
+            await self.sync()
+        if not self.loaded:
+            # Not knowing who is restricted must not mean nobody is
+            try:
+                entries = await self._load([user_id])
+            except SQLAlchemyError as e:
+                raise AllowlistUnavailable(str(e)) from e
+            return not entries[user_id] or NetworkSet(entries[user_id]).contains(ip)
+        networks = self.networks.get(user_id)
+        return networks is None or networks.contains(ip)
+
+    def stats(self) -> dict:
+        return {
+            "revision": self.revision,
+            "loaded": self.loaded,
+            "restricted_users": len(self.networks),
+            "full_loads": self.full_loads,
+            "partial_loads": self.partial_loads,
+        }
+
+ip_allowlist = IPAllowlist(
+    sync_interval=settings.IP_ALLOWLIST_SYNC_INTERVAL,
+    max_staleness=settings.IP_ALLOWLIST_MAX_STALENESS
+)
+redis_manager.subscribe(IPAllowlist.CHANNEL, ip_allowlist.handle_message)
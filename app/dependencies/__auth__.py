@@ -1,66 +1,169 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+
 from datetime import datetime, timedelta, timezone
 from typing import Annotated, Optional
 
-from fastapi import Depends
+from fastapi import Depends, Request
 from fastapi.security import OAuth2PasswordBearer
 
 import jwt
 from jwt.exceptions import InvalidTokenError
-from passlib.context import CryptContext
+from redis.exceptions import RedisError
 
+from app.dependencies.__allowlist__ import AllowlistUnavailable, ip_allowlist
+from app.dependencies.__cache__ import TTLCache
 from app.dependencies.__config__ import settings
-from app.dependencies.__database__ import AsyncSession, get_db, select
-from app.dependencies.__exceptions__ import bad_request, unauthorized
+from app.dependencies.__database__ import AsyncSession, AsyncSessionLocal, replica_router, select, sticky_key, update
+from app.dependencies.__exceptions__ import bad_request, forbidden, service_unavailable, unauthorized
+from app.dependencies.__hashing__ import HashingOverloaded, HashingTimeout, password_hasher
+from app.dependencies.__helpers__ import client_ip
+from app.dependencies.__metrics__ import register_cache
 from app.dependencies.__redis__ import redis_manager
+from app.dependencies.__refresh__ import refresh_tokens
+from app.dependencies.__revocation__ import revocation_list
 
 from app.models.database.account import Users
 
-from app.models.pydantic.user import UserPublic
-from app.models.pydantic.token import TokenData
+from app.models.pydantic.user import UserIdentity
 
 ALGORITHM = settings.algorithm
 SECRET_KEY = settings.secret_key
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+USER_INVALIDATION_CHANNEL = "auth:users:invalidate"
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/auth/token')
 
-def verify_password(plain_password, hashed_password):
-    return bcrypt_context.verify(plain_password, hashed_password)
+# Authenticated users keyed by username, shared by every request on this worker
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
+
+# Verified JWT claims keyed by token digest; each entry lives until the token's exp
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.JWT_EXPIRE * 3600)
+
+register_cache("users", user_cache)
+register_cache("tokens", token_cache)
 
-def get_password_hash(password):
-    return bcrypt_context.hash(password)
+def _on_user_invalidation(message: Optional[str]) -> None:
+    if message is None:
+        user_cache.clear()
+        return
+    for username in json.loads(message):
+        user_cache.pop(username)
+
+redis_manager.subscribe(USER_INVALIDATION_CHANNEL, _on_user_invalidation)
+
+async def invalidate_user(*usernames: str) -> None:
+    """Drops users from this worker's cache and tells the other workers to do the same."""
+    for username in usernames:
+        user_cache.pop(username)
+    await redis_manager.publish(USER_INVALIDATION_CHANNEL, json.dumps(list(usernames)))
+
+async def verify_password(plain_password, hashed_password):
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except (HashingOverloaded, HashingTimeout):
+        raise service_unavailable("Authentication service is busy. Please try again shortly.")
+
+async def get_password_hash(password):
+    try:
+        return await password_hasher.hash(password)
+    except (HashingOverloaded, HashingTimeout):
+        raise service_unavailable("Authentication service is busy. Please try again shortly.")
 
 async def get_user(db: AsyncSession, username: str):
     query = await db.scalars(select(Users).where(Users.username == username))
     return query.first()
     
+# Pending rehashes on this worker, keyed by user id so a burst of logins upgrades a hash once
+_pending_rehashes: dict[int, asyncio.Task] = {}
+
+async def _rehash_password(user_id: int, password: str, old_hash: str) -> None:
+    try:
+        new_hash = await password_hasher.hash(password)
+        async with AsyncSessionLocal() as db:
+            # Matching the old hash keeps a password change made meanwhile from being overwritten
+            await db.execute(
+                update(Users)
+                .where(Users.id == user_id, Users.hashed_password == old_hash)
+                .values(hashed_password=new_hash)
+            )
+            await db.commit()
+    except (HashingOverloaded, HashingTimeout):
+        pass  # Busy with logins; the next successful login tries again
+    except Exception:
+        logging.exception(f"Rehashing the password of user {user_id} failed")
+
+def rehash_in_background(user_id: int, password: str, old_hash: str) -> None:
+    """Upgrades a stored hash to the configured cost without holding up the login that triggered it."""
+    if user_id in _pending_rehashes:
+        return
+    task = asyncio.create_task(_rehash_password(user_id, password, old_hash))
+    _pending_rehashes[user_id] = task
+    task.add_done_callback(lambda _: _pending_rehashes.pop(user_id, None))
+
 async def authenticate_user(db: AsyncSession, username: str, password: str):
     user = await get_user(db, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         return False
+    if password_hasher.needs_update(user.hashed_password):
+        rehash_in_background(user.id, password, user.hashed_password)
     return user
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: AsyncSession = Depends(get_db)):
-    try:
+def decode_token(token: str) -> dict:
+    """Returns the verified claims of a token, skipping the signature check for tokens seen before."""
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is None:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if not username:
-            raise unauthorized("Could not validate credentials.")
-        token_data = TokenData(username=username)
+        if "exp" in payload:
+            token_cache.set(digest, payload, ttl=payload["exp"] - time.time())
+    return payload
+
+async def get_current_user(request: Request, token: Annotated[str, Depends(oauth2_scheme)]):
+    try:
+        payload = decode_token(token)
     except jwt.ExpiredSignatureError:
         raise unauthorized("Expired Token. Please sign in again.")
     except InvalidTokenError:
         raise bad_request("Invalid Token. Please sign in again.")
-    user = await get_user(db, username=token_data.username)
-    if user is None:
-        raise unauthorized("User not found. Please make sure your username is correct.")
-    return user
+    username: str = payload.get("sub")
+    if not username:
+        raise unauthorized("Could not validate credentials.")
+    jti = payload.get("jti")
+    if jti and await revocation_list.is_revoked(jti):
+        raise unauthorized("Token has been revoked. Please sign in again.")
+    if payload.get("userid") is not None:
+        # Set before any lookup, so a user who has just written reads from the primary
+        request.state.principal = f"user:{payload['userid']}"
+    identity = user_cache.get(username)
+    if identity is None:
+        # Only a cache miss needs a database session, and a read replica can answer it
+        async with replica_router.session(sticky_key(request)) as db:
+            user = await get_user(db, username=username)
+        if user is None:
+            raise unauthorized("User not found. Please make sure your username is correct.")
+        identity = UserIdentity(id=user.id, username=user.username, is_admin=user.is_admin, is_active=user.is_active)
+        user_cache.set(username, identity)
+    # Keys and tags per-user response cache entries
+    request.state.principal = f"user:{identity.id}"
+    return identity
 
-async def is_active_user(current_user: Annotated[UserPublic, Depends(get_current_user)]):
+async def is_active_user(request: Request, current_user: Annotated[UserIdentity, Depends(get_current_user)]):
     if not current_user.is_active:
         raise unauthorized("Not Allowed. Please contact admin to activate user.")
+    if settings.IP_ALLOWLIST_ENABLED:
+        try:
+            allowed = await ip_allowlist.is_allowed(current_user.id, client_ip(request.scope))
+        except AllowlistUnavailable:
+            raise service_unavailable("Unable to verify the request address. Please try again shortly.")
+        if not allowed:
+            raise forbidden("Not Allowed. Requests from this address are not permitted for this user.")
     return current_user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -69,11 +172,61 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(hours=settings.JWT_EXPIRE)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def blacklist_token(token: str):
-    await redis_manager.set(token, "blacklisted")
+async def revoke_token(token: str):
+    """Revokes a token for the rest of its lifetime on every worker."""
+    try:
+        payload = decode_token(token)
+    except jwt.ExpiredSignatureError:
+        return
+    except InvalidTokenError:
+        raise bad_request("Invalid Token. Please sign in again.")
+    if "jti" not in payload:
+        raise bad_request("Token cannot be revoked. Please sign in again.")
+    token_cache.pop(hashlib.sha256(token.encode()).digest())
+    try:
+        await revocation_list.revoke(payload["jti"], payload["exp"])
+    except RedisError:
+        raise service_unavailable("Unable to revoke token. Please try again shortly.")
 
-async def is_token_blacklisted(token: str) -> bool:
-    return await redis_manager.exists(token)
\ No newline at end of file
+async def issue_refresh_token(user) -> Optional[str]:
+    """Starts a refresh token family for a sign-in; without Redis the client simply signs in again later."""
+    try:
+        return await refresh_tokens.issue({"sub": user.username, "userid": int(user.id)})
+    except RedisError as e:
+        logging.warning(f"Unable to issue refresh token: {str(e)}")
+        return None
+
+async def rotate_refresh_token(request: Request, refresh_token: str) -> tuple[str, str]:
+    """Exchanges a refresh token for a new access token and a new refresh token, without a password check."""
+    try:
+        new_refresh_token, claims = await refresh_tokens.rotate(refresh_token)
+    except RedisError:
+        raise service_unavailable("Unable to refresh token. Please try again shortly.")
+    if new_refresh_token is None:
+        raise unauthorized("Invalid refresh token. Please sign in again.")
+
+    username = claims["sub"]
+    request.state.principal = f"user:{claims['userid']}"
+    identity = user_cache.get(username)
+    if identity is None:
+        async with replica_router.session(sticky_key(request)) as db:
+            user = await get_user(db, username=username)
+        if user is None:
+            await refresh_tokens.revoke(new_refresh_token)
+            raise unauthorized("User not found. Please make sure your username is correct.")
+        identity = UserIdentity(id=user.id, username=user.username, is_admin=user.is_admin, is_active=user.is_active)
+        user_cache.set(username, identity)
+    if not identity.is_active:
+        # A deactivated account must not keep minting access tokens from an old sign-in
+        await refresh_tokens.revoke(new_refresh_token)
+        raise unauthorized("Not Allowed. Please contact admin to activate user.")
+    return create_access_token(data=claims), new_refresh_token
+
+async def revoke_refresh_token(refresh_token: str) -> None:
+    try:
+        await refresh_tokens.revoke(refresh_token)
+    except RedisError:
+        raise service_unavailable("Unable to revoke token. Please try again shortly.")
\ No newline at end of file
@@ -0,0 +1,103 @@
+import time
+
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries expire after a time-to-live.
+
+    Expired entries are dropped lazily when read, and in bulk every
+    ``purge_interval`` seconds on write so that keys which are never read again
+    do not linger until they are pushed out by the LRU bound. When ``maxbytes``
+    is set, values must support ``len()`` and the cache also evicts to stay
+    under that many bytes.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, purge_interval: float = 60.0, maxbytes: Optional[int] = None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._data: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._next_purge = time.monotonic() + purge_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        size = len(value) if self.maxbytes else 0
+        if self.maxbytes and size > self.maxbytes:
+            return
+        now = time.monotonic()
+        self._remove(key)
+        self._data[key] = (now + ttl, value, size)
+        self._bytes += size
+        while len(self._data) > self.maxsize or (self.maxbytes and self._bytes > self.maxbytes):
+            _, (_, _, evicted_size) = self._data.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+        if now >= self._next_purge:
+            self.purge_expired()
+
+    def _remove(self, key: Hashable):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+        return entry
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._remove(key)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._bytes = 0
+
+    def purge_expired(self) -> int:
+        """Removes every expired entry in one pass and returns how many were dropped."""
+        now = time.monotonic()
+        expired = [key for key, (expires_at, _, _) in self._data.items() if expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        self._next_purge = now + self.purge_interval
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Returns size and hit/miss counters for this worker."""
+        lookups = self.hits + self.misses
+        stats = {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+        if self.maxbytes:
+            stats.update({"bytes": self._bytes, "maxbytes": self.maxbytes})
+        return stats
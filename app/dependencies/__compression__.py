@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import time
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.dependencies.__cache__ import TTLCache
+from app.dependencies.__config__ import settings
+
+class LoadMonitor:
+    """Samples event-loop lag and process CPU use on a fixed interval.
+
+    Lag is how late a ``sleep(interval)`` wakes up, smoothed over recent
+    samples. CPU use is process CPU time over wall time for the same interval,
+    so 1.0 means the worker was busy the whole time.
+    """
+
+    def __init__(self, interval: float = 0.25, smoothing: float = 0.3):
+        self.interval = interval
+        self.smoothing = smoothing
+        self.lag = 0.0
+        self.cpu = 0.0
+        self.task = None
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self._sample())
+
+    async def stop(self) -> None:
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _sample(self) -> None:
+        while True:
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            await asyncio.sleep(self.interval)
+            wall = time.perf_counter() - wall_start
+            cpu = (time.process_time() - cpu_start) / wall if wall else 0.0
+            self.lag += self.smoothing * (max(wall - self.interval, 0.0) - self.lag)
+            self.cpu += self.smoothing * (cpu - self.cpu)
+
+load_monitor = LoadMonitor()
+
+class CompressionStats:
+    def __init__(self):
+        self.compressed = 0
+        self.memo_hits = 0
+        self.skipped = {"encoded": 0, "content_type": 0, "small": 0}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "compressed": self.compressed,
+            "memo_hits": self.memo_hits,
+            "skipped": dict(self.skipped),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_in - self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0,
+            "cpu_seconds": round(self.cpu_seconds, 6),
+        }
+
+stats = CompressionStats()
+memo = TTLCache(maxsize=4096, ttl=settings.CACHE_EXPIRATION, maxbytes=settings.COMPRESSION_MEMO_MAX_BYTES)
+
+def compression_level() -> int:
+    """Interpolates between the configured levels by the worker's current load."""
+    pressure = max(load_monitor.lag / settings.COMPRESSION_LAG_HIGH, load_monitor.cpu / settings.COMPRESSION_CPU_HIGH)
+    pressure = min(max(pressure, 0.0), 1.0)
+    max_level, min_level = settings.COMPRESSION_MAX_LEVEL, settings.COMPRESSION_MIN_LEVEL
+    return round(max_level - (max_level - min_level) * pressure)
+
+class AdaptiveCompressionMiddleware:
+    """gzip for allow-listed content types at a level that drops as the worker gets busy.
+
+    Responses that already carry a Content-Encoding (such as gzip entries from
+    the Redis response cache) pass through untouched. Bodies of cacheable
+    responses, those with a shared-cacheable Cache-Control or flagged with
+    ``request.state.cacheable_body``, are compressed once and reused by hash.
+    The level falls linearly from COMPRESSION_MAX_LEVEL to COMPRESSION_MIN_LEVEL
+    as loop lag approaches COMPRESSION_LAG_HIGH seconds or CPU use approaches
+    COMPRESSION_CPU_HIGH.
+    """
+
+    def __init__(self, app, minimum_size: int = settings.COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = tuple(settings.COMPRESSION_CONTENT_TYPES)
+
+    def _compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            stats.skipped["encoded"] += 1
+            return False
+        content_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+        if not content_type.startswith(self.content_types):
+            stats.skipped["content_type"] += 1
+            return False
+        return True
+
+    @staticmethod
+    def _cacheable(scope, headers: Headers) -> bool:
+        state = scope.get("state") or {}
+        if state.get("cacheable_body"):
+            return True
+        cache_control = headers.get("cache-control", "").lower()
+        if not cache_control or "private" in cache_control or "no-store" in cache_control:
+            return False
+        return "public" in cache_control or "max-age" in cache_control
+
+    def _compress(self, body: bytes, level: int) -> bytes:
+        start = time.thread_time()
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        compressed = compressor.compress(body) + compressor.flush()
+        stats.cpu_seconds += time.thread_time() - start
+        return compressed
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or "gzip" not in Headers(scope=scope).get("accept-encoding", ""):
+            return await self.app(scope, receive, send)
+
+        initial_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal initial_message, compressor, passthrough
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                initial_message = message
+                passthrough = not self._compressible(Headers(raw=message["headers"]))
+                if passthrough:
+                    await send(message)
+                return
+            if message_type != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if initial_message is not None:
+                start_message, initial_message = initial_message, None
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not more_body:
+                    if len(body) < self.minimum_size:
+                        stats.skipped["small"] += 1
+                        passthrough = True
+                        await send(start_message)
+                        await send(message)
+                        return
+                    message["body"] = self._compress_whole(body, self._cacheable(scope, headers))
+                    headers["Content-Length"] = str(len(message["body"]))
+                else:
+                    compressor = zlib.compressobj(compression_level(), zlib.DEFLATED, 31)
+                    del headers["Content-Length"]
+                headers["Content-Encoding"] = "gzip"
+                headers.add_vary_header("Accept-Encoding")
+                await send(start_message)
+                if not more_body:
+                    await send(message)
+                    return
+
+            # Streaming body: compress each chunk as it arrives
+            start = time.thread_time()
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.flush()
+            stats.cpu_seconds += time.thread_time() - start
+            stats.bytes_in += len(body)
+            stats.bytes_out += len(chunk)
+            if not more_body:
+                stats.compressed += 1
+            message["body"] = chunk
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compress_whole(self, body: bytes, cacheable: bool) -> bytes:
+        stats.compressed += 1
+        stats.bytes_in += len(body)
+        if cacheable:
+            digest = hashlib.blake2b(body, digest_size=16).digest()
+            compressed = memo.get(digest)
+            if compressed is not None:
+                stats.memo_hits += 1
+            else:
+                # Memoized output is always produced at the full level, since it is paid for once
+                compressed = self._compress(body, settings.COMPRESSION_MAX_LEVEL)
+                memo.set(digest, compressed)
+        else:
+            compressed = self._compress(body, compression_level())
+        stats.bytes_out += len(compressed)
+        return compressed
+
+def compression_stats() -> dict:
+    """Returns compression counters and the current adaptive level for this worker."""
+    return {
+        **stats.snapshot(),
+        "level": compression_level(),
+        "loop_lag_ms": round(load_monitor.lag * 1000, 3),
+        "cpu": round(load_monitor.cpu, 4),
+        "memo": memo.stats(),
+    }
@@ -0,0 +1,159 @@
+import asyncio
+import math
+import time
+
+from collections import deque
+
+from fastapi.responses import JSONResponse
+
+from app.dependencies.__config__ import ConcurrencyGroup, settings
+from app.dependencies.__metrics__ import route_template
+
+class Overloaded(Exception):
+    """Raised when a request can neither start nor wait for a slot in its group."""
+
+class AdaptiveLimit:
+    """A concurrency limit that follows observed latency (AIMD with a Vegas-style baseline).
+
+    The fastest recent latency is taken as the no-queueing baseline. While
+    requests finish within ``tolerance`` times that baseline the limit grows by
+    about one per limit's worth of completions; a slower completion cuts it by
+    ``backoff`` at most once per baseline interval. The baseline is forgotten
+    every ``baseline_window`` completions so it can follow real changes.
+    Requests over the limit wait in a bounded FIFO queue for at most
+    ``queue_timeout`` seconds.
+    """
+
+    def __init__(self, group: ConcurrencyGroup, tolerance: float = 2.0, backoff: float = 0.9, baseline_window: int = 500):
+        self.name = group.name
+        self.limit = float(group.initial_limit)
+        self.min_limit = group.min_limit
+        self.max_limit = group.max_limit
+        self.queue_size = group.queue_size
+        self.queue_timeout = group.queue_timeout
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.baseline_window = baseline_window
+        self.in_flight = 0
+        self.waiters = deque()
+        self.baseline = math.inf
+        self.next_baseline = math.inf
+        self.samples = 0
+        self.latency = 0.0
+        self.next_decrease = 0.0
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self.waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if len(self.waiters) >= self.queue_size:
+            self.shed += 1
+            raise Overloaded(self.name)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as the wait was abandoned; pass it on
+                self.release()
+            elif waiter in self.waiters:
+                self.waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.shed += 1
+                raise Overloaded(self.name) from None
+            raise
+        # The slot was handed over by release(), which already counted it as in flight
+        self.admitted += 1
+
+    def release(self, latency: float = None) -> None:
+        self.in_flight -= 1
+        if latency is not None:
+            self._adjust(latency)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self.waiters and self.in_flight < int(self.limit):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _adjust(self, latency: float) -> None:
+        self.latency += 0.2 * (latency - self.latency)
+        self.samples += 1
+        self.next_baseline = min(self.next_baseline, latency)
+        if self.samples % self.baseline_window == 0:
+            self.baseline, self.next_baseline = self.next_baseline, math.inf
+        self.baseline = min(self.baseline, latency)
+
+        now = time.monotonic()
+        if latency > self.baseline * self.tolerance:
+            if now >= self.next_decrease:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self.next_decrease = now + self.baseline
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def retry_after(self) -> int:
+        """Rough seconds until a slot frees up: the queue ahead, drained at the current rate."""
+        if not self.latency:
+            return 1
+        return max(1, math.ceil(self.latency * (len(self.waiters) + 1) / max(int(self.limit), 1)))
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued_now": len(self.waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "latency_ms": round(self.latency * 1000, 3),
+            "baseline_ms": round(self.baseline * 1000, 3) if self.baseline != math.inf else None,
+        }
+
+limits = {group.name: AdaptiveLimit(group) for group in settings.CONCURRENCY_GROUPS}
+route_groups = {route: limits[group.name] for group in settings.CONCURRENCY_GROUPS for route in group.routes}
+
+def concurrency_stats() -> dict:
+    """Returns the current limit, queue and shedding counters of each route group on this worker."""
+    return {name: limit.stats() for name, limit in limits.items()}
+
+class ConcurrencyLimitMiddleware:
+    """Caps concurrent requests per route group, answering 503 with Retry-After when the queue is full."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not route_groups:
+            return await self.app(scope, receive, send)
+        limit = route_groups.get(f"{scope['method']} {route_template(scope)}")
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        try:
+            await limit.acquire()
+        except Overloaded:
+            response = JSONResponse(
+                {"detail": "Server is busy. Please retry shortly."},
+                status_code=503,
+                headers={"Retry-After": str(limit.retry_after())}
+            )
+            return await response(scope, receive, send)
+
+        start = time.perf_counter()
+        latency = None
+        try:
+            await self.app(scope, receive, send)
+            latency = time.perf_counter() - start
+        finally:
+            # Failed requests free their slot but say nothing about capacity
+            limit.release(latency)
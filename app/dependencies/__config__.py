@@ -1,12 +1,46 @@
 from os import getenv
 from pathlib import Path
-from pydantic import SecretStr
+from pydantic import BaseModel, SecretStr, model_validator
 from pydantic_settings import BaseSettings
-from typing import Any
+from typing import Any, Optional
 
 # Define the application directory based on the location of the current file
 APP_DIR = Path(__file__).resolve().parent.parent
 
+class RateLimitRule(BaseModel):
+    """Allows ``limit`` requests per ``period`` seconds, in bursts of up to ``burst``.
+
+    ``route`` is a route path template (e.g. "/users/{user_id}") or "*" for any
+    route; the first matching rule applies. ``key`` is "ip", "user" (the JWT
+    subject, falling back to the IP) or "api_key" (the X-API-Key header, same
+    fallback). ``lease`` is how many requests a worker may pre-approve at once.
+    """
+    route: str = "*"
+    methods: list[str] = []
+    key: str = "ip"
+    limit: int
+    period: float
+    burst: int = 1
+    lease: int = 1
+
+    @model_validator(mode="after")
+    def check_lease(self) -> "RateLimitRule":
+        if self.key not in ("ip", "user", "api_key"):
+            raise ValueError(f"Unknown rate limit key {self.key!r}")
+        self.burst = max(self.burst, 1)
+        self.lease = min(max(self.lease, 1), self.burst)
+        return self
+
+class ConcurrencyGroup(BaseModel):
+    """Routes ("METHOD /path/template") that share one adaptive concurrency limit per worker."""
+    name: str
+    routes: list[str]
+    initial_limit: int = 4
+    min_limit: int = 1
+    max_limit: int = 64
+    queue_size: int = 16
+    queue_timeout: float = 2.0  # seconds a request may wait for a slot before it is shed
+
 class Settings(BaseSettings):
     # Directories
     APP_DIR: Path = APP_DIR
@@ -18,6 +52,24 @@ class Settings(BaseSettings):
     # Database URL
     DATABASE_URL: SecretStr = SecretStr(getenv("DATABASE_URL"))
 
+    # Database connection pool. Unless set explicitly, each worker gets an equal share of
+    # DB_MAX_CONNECTIONS (keep it below Postgres max_connections minus admin headroom)
+    WEB_CONCURRENCY: int = 4
+    DB_MAX_CONNECTIONS: int = 80
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: Optional[int] = None
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Optional read replicas (comma-separated URLs), chosen by "least_connections" or "round_robin".
+    # A failing replica is skipped for DB_REPLICA_COOLDOWN seconds; clients read from the primary
+    # for DB_READ_YOUR_WRITES_WINDOW seconds after a write
+    DATABASE_REPLICA_URLS: SecretStr = SecretStr(getenv("DATABASE_REPLICA_URLS", ""))
+    DB_REPLICA_STRATEGY: str = "least_connections"
+    DB_REPLICA_COOLDOWN: float = 30.0
+    DB_READ_YOUR_WRITES_WINDOW: float = 5.0
+
     # Redis Database
     REDIS_HOST: SecretStr = SecretStr(getenv("REDIS_HOST"))
     REDIS_PORT: SecretStr = SecretStr(getenv("REDIS_PORT"))
@@ -25,6 +77,28 @@ class Settings(BaseSettings):
     REDIS_PASSWORD: SecretStr = SecretStr(getenv("REDIS_PASSWORD"))
     REDIS_MAX_CONNECTIONS: int = 20
 
+    # Redis fail-fast behaviour (seconds, unless noted)
+    REDIS_SOCKET_TIMEOUT: float = 1.0
+    REDIS_CONNECT_TIMEOUT: float = 1.0
+    REDIS_RETRY_BASE_DELAY: float = 0.05
+    REDIS_RETRY_DEADLINE: float = 0.5
+    REDIS_BREAKER_FAILURES: int = 5  # failures within the window that open the breaker
+    REDIS_BREAKER_WINDOW: float = 10.0
+    REDIS_BREAKER_RESET_TIMEOUT: float = 5.0
+    REDIS_BREAKER_HALF_OPEN_PROBES: int = 1
+
+    # Optional in-process L1 cache in front of Redis GETs ("tracking" or "pubsub" invalidation)
+    REDIS_L1_ENABLED: bool = False
+    REDIS_L1_MODE: str = "tracking"
+    REDIS_L1_MAX_ITEMS: int = 10000
+    REDIS_L1_MAX_BYTES: int = 64 * 1024 * 1024
+    REDIS_L1_TTL: float = 60.0
+
+    # Opt-in auto-pipelining of concurrent commands (seconds to wait for more; 0 = same loop tick)
+    REDIS_AUTO_PIPELINE: bool = False
+    REDIS_PIPELINE_WINDOW: float = 0.0
+    REDIS_PIPELINE_MAX_BATCH: int = 256
+
     # Admin Information
     ADMIN_USERNAME: SecretStr = SecretStr(getenv("ADMIN_USERNAME"))
     ADMIN_EMAIL: SecretStr = SecretStr(getenv("ADMIN_EMAIL"))
@@ -35,9 +109,100 @@ class Settings(BaseSettings):
     # Redis Cache Expiration time 4 Hours
     CACHE_EXPIRATION: int = 14400
 
+    # Seconds a worker may hold a cache rebuild lock, and that others wait for its result
+    CACHE_LOCK_TIMEOUT: int = 10
+    CACHE_LOCK_WAIT: float = 5.0
+
+    # gzip level used once when storing compressed cache entries
+    CACHE_COMPRESSION_LEVEL: int = 6
+
     # JWT Token Expiration time in hours
     JWT_EXPIRE: int = 1
 
+    # Refresh token lifetime in days: since its last use, and since the original sign-in
+    REFRESH_TOKEN_EXPIRE: int = 7
+    REFRESH_TOKEN_MAX_LIFETIME: int = 30
+
+    # Password hashing worker pool (threads per worker, waiting calls, seconds per call)
+    HASH_WORKERS: int = 4
+    HASH_MAX_QUEUE: int = 64
+    HASH_TIMEOUT: float = 10.0
+
+    # bcrypt cost factor; calibrate with `python -m app.dependencies.__hashing__`
+    BCRYPT_ROUNDS: int = 12
+
+    # Per-worker cache of authenticated users (entries, seconds)
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL: int = 30
+
+    # Per-worker cache of verified JWT claims (entries), each kept until its token expires
+    TOKEN_CACHE_SIZE: int = 50000
+
+    # Seconds between checks of the shared token revocation revision
+    REVOCATION_SYNC_INTERVAL: float = 5.0
+
+    # Per-user source IP allowlists, seconds between checks of their shared revision,
+    # and seconds after which a worker reloads them all even if the revision did not move
+    IP_ALLOWLIST_ENABLED: bool = True
+    IP_ALLOWLIST_SYNC_INTERVAL: float = 5.0
+    IP_ALLOWLIST_MAX_STALENESS: float = 60.0
+
+    # User listing page sizes and rows fetched per round trip when exporting
+    USERS_PAGE_SIZE: int = 100
+    USERS_MAX_PAGE_SIZE: int = 1000
+    USERS_EXPORT_CHUNK_SIZE: int = 1000
+
+    # Bulk user provisioning (items per request, rows per INSERT)
+    USERS_BULK_MAX_ITEMS: int = 10000
+    USERS_BULK_CHUNK_SIZE: int = 500
+
+    # Prometheus metrics, shared between workers through per-process files in METRICS_DIR
+    # (off by default; the directory is emptied when gunicorn starts, clear it yourself between other runs)
+    METRICS_ENABLED: bool = False
+    METRICS_DIR: Path = Path("/tmp/api_metrics")
+
+    # Response compression: gzip level drops from MAX to MIN as event-loop lag (seconds) or process
+    # CPU use (fraction of one core) approach their HIGH marks. Cacheable bodies are compressed once
+    COMPRESSION_MINIMUM_SIZE: int = 1000
+    COMPRESSION_MAX_LEVEL: int = 5
+    COMPRESSION_MIN_LEVEL: int = 1
+    COMPRESSION_LAG_HIGH: float = 0.05
+    COMPRESSION_CPU_HIGH: float = 0.9
+    COMPRESSION_MEMO_MAX_BYTES: int = 16 * 1024 * 1024
+    COMPRESSION_CONTENT_TYPES: tuple[str, ...] = (
+        "text/",
+        "application/json",
+        "application/x-ndjson",
+        "application/javascript",
+        "application/xml",
+        "image/svg+xml"
+    )
+
+    # Number of reverse proxies (nginx) in front of the app whose X-Forwarded-For entries are trusted
+    TRUSTED_PROXY_HOPS: int = 1
+
+    # Rate limiting (rules may be given as JSON in RATE_LIMIT_RULES); requests are allowed when Redis is down
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_LEASE_TTL: float = 1.0  # seconds a worker may spend requests pre-approved by Redis
+    RATE_LIMIT_RULES: list[RateLimitRule] = [
+        RateLimitRule(route="/auth/token", methods=["POST"], key="ip", limit=10, period=60, burst=5),
+        RateLimitRule(route="/users/bulk", methods=["POST"], key="user", limit=10, period=60, burst=2),
+        RateLimitRule(route="*", key="user", limit=1200, period=60, burst=100, lease=10),
+    ]
+
+    # Adaptive concurrency limits for expensive routes (may be given as JSON in CONCURRENCY_GROUPS);
+    # routes outside every group are not limited
+    CONCURRENCY_LIMIT_ENABLED: bool = True
+    CONCURRENCY_GROUPS: list[ConcurrencyGroup] = [
+        ConcurrencyGroup(
+            name="password_hashing",
+            routes=["POST /auth/token", "POST /users/", "POST /users/bulk", "PUT /users/{user_id}"],
+            initial_limit=4,
+            max_limit=32
+        ),
+        ConcurrencyGroup(name="export", routes=["GET /users/export"], initial_limit=2, max_limit=4, queue_size=4),
+    ]
+
     # FastAPI core settings
     FASTAPI_PROPERTIES: dict = {
         "title": "FastAPI Application",
@@ -91,6 +256,31 @@ class Settings(BaseSettings):
             raise ValueError("Database URL not configured")
         return url
 
+    @property
+    def database_replica_urls(self) -> list[str]:
+        """Safely retrieves the read replica URLs, if any are configured."""
+        urls = self.DATABASE_REPLICA_URLS.get_secret_value() or ""
+        return [url.strip() for url in urls.split(",") if url.strip()]
+
+    @property
+    def db_connections_per_worker(self) -> int:
+        """Share of the connection budget available to each gunicorn worker."""
+        return max(self.DB_MAX_CONNECTIONS // max(self.WEB_CONCURRENCY, 1), 2)
+
+    @property
+    def db_max_overflow(self) -> int:
+        """Overflow connections per worker; a quarter of the worker's share by default."""
+        if self.DB_MAX_OVERFLOW is not None:
+            return self.DB_MAX_OVERFLOW
+        return self.db_connections_per_worker // 4
+
+    @property
+    def db_pool_size(self) -> int:
+        """Persistent connections per worker; the rest of the worker's share by default."""
+        if self.DB_POOL_SIZE is not None:
+            return self.DB_POOL_SIZE
+        return max(self.db_connections_per_worker - self.db_max_overflow, 1)
+
     # Redis Database
     @property
     def redis_host(self) -> str:
@@ -1,50 +1,296 @@
+import hashlib
+import logging
+import time
+
+from contextlib import asynccontextmanager
 from datetime import datetime
-from passlib.context import CryptContext
+from fastapi import Request
+from typing import AsyncIterator, Optional
 
-from sqlalchemy import func, create_engine, delete, insert, or_, select
+from sqlalchemy import event, func, delete, insert, make_url, or_, select, update
 from sqlalchemy import Table, Column, ForeignKey, JSON, String, Boolean, Integer
 from sqlalchemy.exc import IntegrityError, OperationalError, SQLAlchemyError
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase, DeclarativeMeta, Mapped, aliased, joinedload, mapped_column, relationship
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, DeclarativeMeta, Mapped, Session, aliased, joinedload, mapped_column, relationship
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from app.dependencies.__cache__ import TTLCache
 from app.dependencies.__config__ import settings
+from app.dependencies.__hashing__ import password_hasher
+from app.dependencies.__metrics__ import instrument_engine
+from app.dependencies.__redis__ import redis_manager
 
 # Database URL from environment, expecting PostgreSQL
 DATABASE_URL = settings.database_url
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 class Base(DeclarativeBase):
     """Base class for all ORM models."""
     __abstract__ = True  # Ensure this base class does not create a table
     created_at: Mapped[datetime] = mapped_column(default=func.now())
     updated_at: Mapped[datetime] = mapped_column(default=func.now(), onupdate=func.now())
 
-# Synchronous engine for schema creation (for migration tools like Alembic)
-connect_args = {"check_same_thread": False}
-sync_engine = create_engine(DATABASE_URL, connect_args=connect_args)
+class PoolMetrics:
+    """Checkout counters for one connection pool, shared across pool re-creation."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, waited: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    metrics: PoolMetrics = None
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.record(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+def create_pooled_engine(url: str, role: str = "primary") -> AsyncEngine:
+    """Creates an async engine sized from Settings so every worker stays within the connection budget."""
+    parsed_url = make_url(url)
+    if parsed_url.get_backend_name() == "sqlite" and parsed_url.database in (None, "", ":memory:"):
+        # In-memory SQLite uses a single static connection; pool sizing does not apply
+        engine = create_async_engine(url)
+        instrument_engine(engine, role)
+        return engine
+
+    engine = create_async_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING
+    )
+    engine.pool.metrics = PoolMetrics()
+    instrument_engine(engine, role)
+    return engine
+
+def pool_stats(engine: AsyncEngine) -> dict:
+    """Returns size, in-use and checkout-wait figures for an engine's pool on this worker."""
+    pool = engine.pool
+    metrics = getattr(pool, "metrics", None)
+    if metrics is None:
+        return {"pool": pool.status()}
+    return {
+        "size": pool.size(),
+        "max_overflow": settings.db_max_overflow,
+        "in_use": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": metrics.checkouts,
+        "timeouts": metrics.timeouts,
+        "avg_wait_ms": round(metrics.wait_seconds / metrics.checkouts * 1000, 3) if metrics.checkouts else 0.0,
+        "max_wait_ms": round(metrics.max_wait_seconds * 1000, 3),
+    }
 
 # Asynchronous engine for normal operation
-async_engine = create_async_engine(DATABASE_URL)
+async_engine = create_pooled_engine(DATABASE_URL)
+
+class WriteTrackingSession(Session):
+    """Session that records in ``info["committed_writes"]`` whether it committed any change."""
+
+@event.listens_for(WriteTrackingSession, "after_flush")
+def _record_flush(session, flush_context):
+    session.info["pending_writes"] = True
+
+@event.listens_for(WriteTrackingSession, "do_orm_execute")
+def _record_statement(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["pending_writes"] = True
+
+@event.listens_for(WriteTrackingSession, "after_commit")
+def _record_commit(session):
+    if session.info.pop("pending_writes", False):
+        session.info["committed_writes"] = True
+
+@event.listens_for(WriteTrackingSession, "after_rollback")
+def _forget_writes(session):
+    session.info.pop("pending_writes", None)
 
 # Asynchronous session maker
 AsyncSessionLocal = async_sessionmaker(
     autoflush=False,
     autocommit=False,
     bind=async_engine,
-    class_=AsyncSession
+    class_=AsyncSession,
+    sync_session_class=WriteTrackingSession
+)
+
+def sticky_key(request: Request) -> str:
+    """Identifies a client for read-your-writes routing: the principal set by the auth dependencies, else its credentials or address."""
+    principal = getattr(request.state, "principal", None)
+    if principal:
+        return principal
+    credentials = request.headers.get("authorization") or (request.client.host if request.client else "")
+    return hashlib.sha256(credentials.encode()).hexdigest()
+
+class ReplicaRouter:
+    """Sends read-only sessions to replica engines, falling back to the primary.
+
+    Replicas are chosen by fewest checked-out connections or in turn, and one
+    that fails to connect is skipped for ``cooldown`` seconds. A client that has
+    just written is pinned to the primary for ``sticky_window`` seconds so that
+    replication lag never hides its own write; the pin is shared with the other
+    workers over pub/sub.
+    """
+
+    CHANNEL = "db:sticky"
+
+    def __init__(self, urls: list[str], strategy: str, cooldown: float, sticky_window: float):
+        self.engines = [create_pooled_engine(url, role="replica") for url in urls]
+        self.sessionmakers = [
+            async_sessionmaker(autoflush=False, autocommit=False, bind=engine, class_=AsyncSession)
+            for engine in self.engines
+        ]
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self.sticky = TTLCache(maxsize=100000, ttl=sticky_window)
+        self.down_until = [0.0] * len(self.engines)
+        self.failures = [0] * len(self.engines)
+        self.reads = [0] * len(self.engines)
+        self.primary_reads = 0
+        self._turn = 0
+
+    def handle_message(self, message: Optional[str]) -> None:
+        if message is not None:
+            self.sticky.set(message, True)
+
+    async def mark_written(self, key: str) -> None:
+        """Pins a client to the primary on every worker after it wrote."""
+        if self.engines:
+            self.sticky.set(key, True)
+            await redis_manager.publish(self.CHANNEL, key)
+
+    def choose(self) -> Optional[int]:
+        now = time.monotonic()
+        healthy = [index for index, until in enumerate(self.down_until) if until <= now]
+        if not healthy:
+            return None
+        if self.strategy == "round_robin":
+            self._turn += 1
+            return healthy[self._turn % len(healthy)]
+        return min(healthy, key=lambda index: self.engines[index].pool.checkedout())
+
+    def mark_unhealthy(self, index: int, error: Exception) -> None:
+        self.failures[index] += 1
+        self.down_until[index] = time.monotonic() + self.cooldown
+        logging.warning(f"Read replica {index} unavailable for {self.cooldown}s: {str(error)}")
+
+    async def _connect_replica(self) -> tuple[Optional[int], Optional[AsyncSession]]:
+        for _ in self.engines:
+            index = self.choose()
+            if index is None:
+                break
+            db = self.sessionmakers[index]()
+            try:
+                # Check out a connection up front so an unreachable replica can still fall back
+                await db.connection()
+            except (OperationalError, PoolTimeoutError, OSError) as e:
+                await db.close()
+                self.mark_unhealthy(index, e)
+                continue
+            return index, db
+        return None, None
+
+    @asynccontextmanager
+    async def session(self, key: Optional[str] = None) -> AsyncIterator[AsyncSession]:
+        """Yields a read-only session on a healthy replica, or on the primary when none is usable."""
+        index, db = None, None
+        if self.engines and (key is None or self.sticky.get(key) is None):
+            index, db = await self._connect_replica()
+        if db is None:
+            self.primary_reads += 1
+            db = AsyncSessionLocal()
+        else:
+            self.reads[index] += 1
+        async with db:
+            try:
+                yield db
+            except OperationalError as e:
+                if index is not None:
+                    self.mark_unhealthy(index, e)
+                raise
+
+    def stats(self) -> dict:
+        """Returns routing counters and pool figures for each replica on this worker."""
+        now = time.monotonic()
+        return {
+            "strategy": self.strategy,
+            "primary_reads": self.primary_reads,
+            "replicas": [
+                {
+                    "healthy": self.down_until[index] <= now,
+                    "reads": self.reads[index],
+                    "failures": self.failures[index],
+                    "pool": pool_stats(engine),
+                }
+                for index, engine in enumerate(self.engines)
+            ],
+        }
+
+replica_router = ReplicaRouter(
+    urls=settings.database_replica_urls,
+    strategy=settings.DB_REPLICA_STRATEGY,
+    cooldown=settings.DB_REPLICA_COOLDOWN,
+    sticky_window=settings.DB_READ_YOUR_WRITES_WINDOW
 )
+redis_manager.subscribe(ReplicaRouter.CHANNEL, replica_router.handle_message)
 
-async def get_db():
+async def get_db(request: Request):
     """Dependency that provides a database session and handles transaction lifecycle."""
-    async with AsyncSessionLocal() as db:
-        try:
-            yield db
-        except SQLAlchemyError:
-            await db.rollback()
-            raise
-        finally:
-            await db.close()
+    db = AsyncSessionLocal()
+    try:
+        async with db:
+            try:
+                yield db
+            except SQLAlchemyError:
+                await db.rollback()
+                raise
+            finally:
+                await db.close()
+    finally:
+        # Only after a committed change, and also when the handler raised after committing (delete_user answers with an HTTPException)
+        if db.info.get("committed_writes"):
+            await replica_router.mark_written(sticky_key(request))
+
+async def get_read_db(request: Request):
+    """Dependency that provides a read-only session, served by a replica when one is configured."""
+    async with replica_router.session(sticky_key(request)) as db:
+        yield db
+
+def discard_inherited_connections() -> None:
+    """Drops pooled connections copied from the parent process, without closing the parent's sockets.
+
+    Called in each gunicorn worker right after fork, so that every worker
+    opens its own connections on first use.
+    """
+    for engine in (async_engine, *replica_router.engines):
+        engine.sync_engine.dispose(close=False)
+
+async def dispose_engines() -> None:
+    for engine in (async_engine, *replica_router.engines):
+        await engine.dispose()
 
 class DatabaseManager:
     def __init__(self, session: AsyncSession):
@@ -62,7 +308,7 @@ class DatabaseManager:
                 first_name=settings.admin_firstname,
                 last_name=settings.admin_lastname,
                 email=settings.admin_email,
-                hashed_password=bcrypt_context.hash(settings.admin_password),
+                hashed_password=await password_hasher.hash(settings.admin_password),
                 is_admin=True,
                 is_active=True
             )
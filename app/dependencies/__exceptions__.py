@@ -35,3 +35,9 @@ def conflict(detail: str):
         headers={"WWW-Authenticate": "Bearer"}
     )
 
+def service_unavailable(detail: str, retry_after: int = 1):
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": str(retry_after)}
+    )
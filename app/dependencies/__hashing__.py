@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import logging
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+from app.dependencies.__config__ import settings
+
+# Hashes below BCRYPT_ROUNDS report needs_update and are upgraded on the next successful login
+bcrypt_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS
+)
+
+class HashingOverloaded(Exception):
+    """Raised when the hashing queue is full and the call is rejected outright."""
+
+class HashingTimeout(Exception):
+    """Raised when a hashing call does not complete within its timeout."""
+
+class PasswordHasher:
+    """Runs bcrypt hashing and verification on a bounded worker pool.
+
+    bcrypt releases the GIL while it works, so a thread pool keeps the event loop
+    responsive without the cost of a process pool. At most ``workers`` calls run
+    at once, at most ``max_queue`` more may wait, and anything beyond that is
+    rejected immediately instead of piling up behind a login burst.
+    """
+
+    def __init__(self, workers: int, max_queue: int, timeout: float):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.executor = None
+        self._semaphore = None
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._busy_seconds = 0.0
+
+    def _ensure_executor(self) -> None:
+        # Created lazily so that the pool belongs to the worker process, not the master.
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hasher")
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+    async def _execute(self, func, *args):
+        async with self._semaphore:
+            self._running += 1
+            start = time.perf_counter()
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.executor, func, *args)
+            finally:
+                self._busy_seconds += time.perf_counter() - start
+                self._running -= 1
+                self._completed += 1
+
+    async def _run(self, func, *args):
+        self._ensure_executor()
+        if self._pending >= self.workers + self.max_queue:
+            self._rejected += 1
+            raise HashingOverloaded("Password hashing queue is full")
+
+        self._pending += 1
+        try:
+            return await asyncio.wait_for(self._execute(func, *args), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            logging.warning(f"Password hashing call exceeded {self.timeout}s timeout")
+            raise HashingTimeout("Password hashing timed out") from None
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(bcrypt_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(bcrypt_context.verify, password, hashed_password)
+
+    def needs_update(self, hashed_password: str) -> bool:
+        """Whether a hash was made with an outdated scheme or cost; cheap enough to call inline."""
+        return bcrypt_context.needs_update(hashed_password)
+
+    async def hash_many(self, passwords: list[str]) -> list[str]:
+        """Hashes a batch concurrently without ever holding more than ``workers`` queue slots.
+
+        Bulk jobs therefore keep the pool busy while leaving the queue free for
+        interactive logins arriving at the same time.
+        """
+        limiter = asyncio.Semaphore(self.workers)
+
+        async def hash_one(password: str) -> str:
+            async with limiter:
+                return await self.hash(password)
+
+        tasks = [asyncio.create_task(hash_one(password)) for password in passwords]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            # gather() leaves the others running on failure; nobody would await them
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    def stats(self) -> dict:
+        """Returns queue depth and throughput counters for this worker."""
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queue_depth": max(self._pending - self._running, 0),
+            "running": self._running,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "timeouts": self._timeouts,
+            "busy_seconds": round(self._busy_seconds, 6),
+        }
+
+    def shutdown(self) -> None:
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            self._semaphore = None
+
+password_hasher = PasswordHasher(
+    workers=settings.HASH_WORKERS,
+    max_queue=settings.HASH_MAX_QUEUE,
+    timeout=settings.HASH_TIMEOUT
+)
+
+def calibrate(target: float, samples: int = 3, min_rounds: int = 4, max_rounds: int = 18) -> tuple[int, dict[int, float]]:
+    """Times a verify at increasing costs and returns the highest rounds within ``target`` seconds, with the timings.
+
+    Each extra round doubles the work, so timing stops at the first cost over the target.
+    """
+    timings = {}
+    recommended = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=rounds)
+        hashed_password = context.hash("calibration-password")
+        best = float("inf")
+        for _ in range(samples):
+            start = time.perf_counter()
+            context.verify("calibration-password", hashed_password)
+            best = min(best, time.perf_counter() - start)
+        timings[rounds] = best
+        if best > target:
+            break
+        recommended = rounds
+    return recommended, timings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recommends BCRYPT_ROUNDS for a target verify time on this machine.")
+    parser.add_argument("--target-ms", type=float, default=250.0, help="verify time budget per login in milliseconds")
+    parser.add_argument("--samples", type=int, default=3, help="verifications timed per cost, keeping the fastest")
+    args = parser.parse_args()
+
+    recommended, timings = calibrate(args.target_ms / 1000, samples=args.samples)
+    for rounds, seconds in timings.items():
+        marker = " <- recommended" if rounds == recommended else " (current)" if rounds == settings.BCRYPT_ROUNDS else ""
+        print(f"rounds {rounds:>2}: {seconds * 1000:9.1f} ms{marker}")
+    print(f"BCRYPT_ROUNDS={recommended}")
+    # Throughput of the pool follows from the per-call time and the number of hashing threads
+    print(f"~{settings.HASH_WORKERS / timings[recommended]:.0f} logins/s per worker with HASH_WORKERS={settings.HASH_WORKERS}")
@@ -1,19 +1,111 @@
+import asyncio
+import gc
+import hashlib
+import logging
+import os
+import resource
+import time
+
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from starlette.datastructures import Headers
 
-from app.dependencies.__database__ import create_database
+from app.dependencies.__compression__ import load_monitor
+from app.dependencies.__config__ import settings
+from app.dependencies.__database__ import create_database, dispose_engines
+from app.dependencies.__hashing__ import password_hasher
 from app.dependencies.__redis__ import redis_manager
 
+# Set in the gunicorn master once the schema and admin user exist; inherited by forked workers
+bootstrapped = False
+
+def client_ip(scope) -> str:
+    """The caller's address, read from X-Forwarded-For when requests arrive through trusted proxies.
+
+    nginx appends the address it saw to X-Forwarded-For, so with N trusted
+    proxies the Nth entry from the end is the first one a client cannot forge.
+    """
+    hops = settings.TRUSTED_PROXY_HOPS
+    if hops:
+        forwarded = Headers(scope=scope).get("x-forwarded-for")
+        if forwarded:
+            addresses = [address.strip() for address in forwarded.split(",")]
+            return addresses[max(len(addresses) - hops, 0)]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+def weak_etag(*parts) -> str:
+    """A weak ETag over the values a representation is built from."""
+    digest = hashlib.blake2b(":".join(str(part) for part in parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag, as GET and HEAD require."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+def rss_mb() -> float:
+    """Current resident memory of this process in MiB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def private_mb() -> float:
+    """Memory this process does not share with the others (e.g. pages copied after fork), in MiB."""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            return sum(int(line.split()[1]) for line in f if line.startswith(("Private_Clean", "Private_Dirty"))) / 1024
+    except OSError:
+        return float("nan")
+
+async def _bootstrap() -> None:
+    await create_database()
+    # Nothing opened here may be inherited: not database connections, not the hashing threads
+    await dispose_engines()
+    password_hasher.shutdown()
+
+def bootstrap() -> None:
+    """Runs one-time startup work in the gunicorn master, then freezes the heap before workers fork.
+
+    ``gc.freeze()`` moves every object created so far out of the collector's
+    reach, so collections in the workers do not touch, and therefore copy,
+    the pages they share with the master.
+    """
+    global bootstrapped
+    asyncio.run(_bootstrap())
+    bootstrapped = True
+    gc.collect()
+    gc.freeze()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Context manager for FastAPI app, handles startup and shutdown tasks."""
+    started = time.perf_counter()
     try:
-        await create_database()
+        if not bootstrapped:
+            # Not preloaded by gunicorn (e.g. `fastapi dev`), so this process bootstraps itself
+            await create_database()
         await redis_manager.init_client()
+        load_monitor.start()
     except Exception as e:
         raise RuntimeError("Failed to initialize resources on startup") from e
+    logging.getLogger("uvicorn.error").info(
+        f"Worker {os.getpid()} started in {time.perf_counter() - started:.3f}s, "
+        f"RSS {rss_mb():.1f} MiB ({private_mb():.1f} MiB private)"
+    )
     yield
     try:
+        await load_monitor.stop()
         await redis_manager.close_client()
+        password_hasher.shutdown()
     except Exception as e:
         raise RuntimeError("Failed to clean up resources on shutdown") from e
\ No newline at end of file
@@ -0,0 +1,361 @@
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+from starlette.routing import Match
+
+from app.dependencies.__config__ import settings
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_HEADER = struct.Struct("i4x")
+_KEY_LENGTH = struct.Struct("i")
+_VALUE = struct.Struct("d")
+
+class MmapedValues:
+    """Append-only map of sample keys to doubles, backed by a memory-mapped file.
+
+    Each worker writes only its own file, so updates are plain in-place stores
+    with no cross-process locking. The header holds the number of bytes in use
+    and is written after each new entry, so a concurrent reader only ever sees
+    complete entries. The layout is ``[key length][key, padded to 8][value]``.
+    """
+
+    def __init__(self, path: Path, initial_size: int = 1024 * 1024):
+        self.path = path
+        self._file = open(path, "a+b")
+        size = max(os.fstat(self._file.fileno()).st_size, initial_size)
+        self._file.truncate(size)
+        self._capacity = size
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self._positions = {}
+        self._used = _HEADER.unpack_from(self._mmap, 0)[0] or _HEADER.size
+        for key, _, position in iterate_entries(self._mmap, self._used):
+            self._positions[key] = position
+
+    def _add(self, key: str) -> int:
+        encoded = key.encode()
+        padded_length = len(encoded) + (8 - (len(encoded) + _KEY_LENGTH.size) % 8) % 8
+        entry_size = _KEY_LENGTH.size + padded_length + _VALUE.size
+        while self._used + entry_size > self._capacity:
+            self._capacity *= 2
+            self._file.truncate(self._capacity)
+            self._mmap.close()
+            self._mmap = mmap.mmap(self._file.fileno(), self._capacity)
+        position = self._used + _KEY_LENGTH.size + padded_length
+        struct.pack_into(f"i{padded_length}sd", self._mmap, self._used, len(encoded), encoded, 0.0)
+        self._used += entry_size
+        _HEADER.pack_into(self._mmap, 0, self._used)
+        self._positions[key] = position
+        return position
+
+    def increment(self, key: str, amount: float) -> None:
+        position = self._positions.get(key)
+        if position is None:
+            position = self._add(key)
+        _VALUE.pack_into(self._mmap, position, _VALUE.unpack_from(self._mmap, position)[0] + amount)
+
+    def close(self) -> None:
+        self._mmap.close()
+        self._file.close()
+
+def iterate_entries(data, used: int):
+    """Yields ``(key, value, value_position)`` for every complete entry in a values buffer."""
+    position = _HEADER.size
+    while position < used:
+        key_length = _KEY_LENGTH.unpack_from(data, position)[0]
+        padded_length = key_length + (8 - (key_length + _KEY_LENGTH.size) % 8) % 8
+        key_start = position + _KEY_LENGTH.size
+        value_position = key_start + padded_length
+        key = bytes(data[key_start:key_start + key_length]).decode()
+        yield key, _VALUE.unpack_from(data, value_position)[0], value_position
+        position = value_position + _VALUE.size
+
+class MetricsStore:
+    """Opens this process's values files on first use and re-opens them after a fork.
+
+    Counters and histograms go to ``counters_<pid>.db`` and are summed across
+    every file, including those of workers that have exited, so totals never go
+    backwards. Gauges go to ``gauges_<pid>.db``, which is removed when the
+    worker exits so that its in-flight requests stop being counted.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._pid = None
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def _values(self, kind: str) -> MmapedValues:
+        pid = os.getpid()
+        if pid != self._pid:
+            # Inherited from the gunicorn master; this worker needs files of its own
+            self._files = {}
+            self._pid = pid
+        values = self._files.get(kind)
+        if values is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            values = self._files[kind] = MmapedValues(self.directory / f"{kind}_{pid}.db")
+        return values
+
+    def increment(self, kind: str, *updates: tuple[str, float]) -> None:
+        """Adds each ``(key, amount)`` pair to this process's values."""
+        with self._lock:
+            values = self._values(kind)
+            for key, amount in updates:
+                values.increment(key, amount)
+
+    def collect(self) -> dict:
+        """Sums every sample across all workers' files."""
+        samples = defaultdict(float)
+        for path in glob.glob(str(self.directory / "*.db")):
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            if len(data) < _HEADER.size:
+                continue
+            for key, value, _ in iterate_entries(data, _HEADER.unpack_from(data, 0)[0]):
+                samples[key] += value
+        return samples
+
+store = MetricsStore(Path(settings.METRICS_DIR)) if settings.METRICS_ENABLED else None
+registry = []
+
+def _sample_key(name: str, labels: tuple) -> str:
+    return json.dumps([name, labels])
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._keys = {}
+        registry.append(self)
+
+    def _keys_for(self, labelvalues: tuple) -> tuple:
+        keys = self._keys.get(labelvalues)
+        if keys is None:
+            labels = tuple(zip(self.labelnames, labelvalues))
+            bucket_keys = [
+                _sample_key(f"{self.name}_bucket", labels + (("le", repr(bound)),))
+                for bound in self.buckets
+            ] + [_sample_key(f"{self.name}_bucket", labels + (("le", "+Inf"),))]
+            keys = self._keys[labelvalues] = (
+                bucket_keys,
+                _sample_key(f"{self.name}_sum", labels),
+                _sample_key(f"{self.name}_count", labels)
+            )
+        return keys
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        if store is None:
+            return
+        bucket_keys, sum_key, count_key = self._keys_for(labelvalues)
+        # Buckets are stored non-cumulatively (one write per observation) and summed up on render
+        store.increment("counters", (bucket_keys[bisect_left(self.buckets, value)], 1.0), (sum_key, value), (count_key, 1.0))
+
+    def render(self, samples: dict) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, (bucket_keys, sum_key, count_key) in sorted(self._collected(samples).items()):
+            labels = tuple(zip(self.labelnames, labelvalues))
+            cumulative = 0.0
+            for bound, key in zip(self.buckets + ("+Inf",), bucket_keys):
+                cumulative += samples.get(key, 0.0)
+                le = "+Inf" if bound == "+Inf" else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', le),))} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(samples.get(sum_key, 0.0))}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(samples.get(count_key, 0.0))}")
+        return lines
+
+    def _collected(self, samples: dict) -> dict:
+        # Label sets recorded by any worker, not just the one rendering
+        collected = {}
+        for key in samples:
+            name, labels = json.loads(key)
+            if name == f"{self.name}_count":
+                labelvalues = tuple(value for _, value in labels)
+                collected[labelvalues] = self._keys_for(labelvalues)
+        return collected
+
+class Gauge:
+    kind = "gauges"
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._keys = {}
+        registry.append(self)
+
+    def _key_for(self, labelvalues: tuple) -> str:
+        key = self._keys.get(labelvalues)
+        if key is None:
+            key = self._keys[labelvalues] = _sample_key(self.name, tuple(zip(self.labelnames, labelvalues)))
+        return key
+
+    def increment(self, amount: float, *labelvalues: str) -> None:
+        if store is not None:
+            store.increment(self.kind, (self._key_for(labelvalues), amount))
+
+    def render(self, samples: dict) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for key, value in sorted(samples.items()):
+            name, labels = json.loads(key)
+            if name == self.name:
+                lines.append(f"{self.name}{_format_labels(tuple(map(tuple, labels)))} {_format_value(value)}")
+        return lines
+
+class Counter(Gauge):
+    """A monotonic total; kept in the counters file so it survives the worker that counted it."""
+    kind = "counters"
+    type = "counter"
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels)
+    return "{" + pairs + "}"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being handled, by route.", ("method", "route"))
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "Database statement latency.", ("database", "operation"))
+REDIS_COMMAND_LATENCY = Histogram("redis_command_duration_seconds", "Redis command latency, including pipelines.", ("command",))
+CACHE_HITS = Counter("cache_hits_total", "Lookups answered by an in-process cache.", ("cache",))
+CACHE_MISSES = Counter("cache_misses_total", "Lookups an in-process cache could not answer.", ("cache",))
+CACHE_EVICTIONS = Counter("cache_evictions_total", "Entries pushed out of an in-process cache by its bounds.", ("cache",))
+CACHE_ENTRIES = Gauge("cache_entries", "Entries held by an in-process cache.", ("cache",))
+
+# In-process caches reported as metrics, with the values last written for each
+_caches = {}
+
+def register_cache(name: str, cache) -> None:
+    """Reports a TTLCache's hit, miss and eviction counters and its size under ``cache="<name>"``."""
+    _caches[name] = (cache, {"hits": 0, "misses": 0, "evictions": 0, "size": 0})
+
+def publish_cache_stats() -> None:
+    """Writes what changed in each registered cache since the last call; the caches count in plain attributes."""
+    if store is None:
+        return
+    for name, (cache, published) in _caches.items():
+        current = {"hits": cache.hits, "misses": cache.misses, "evictions": cache.evictions, "size": len(cache)}
+        for field, metric in (("hits", CACHE_HITS), ("misses", CACHE_MISSES), ("evictions", CACHE_EVICTIONS), ("size", CACHE_ENTRIES)):
+            delta = current[field] - published[field]
+            if delta:
+                metric.increment(float(delta), name)
+                published[field] = current[field]
+
+def render_metrics() -> str:
+    """Renders all metrics, aggregated across workers, in the Prometheus text format."""
+    if store is None:
+        return ""
+    publish_cache_stats()
+    samples = store.collect()
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render(samples))
+    return "\n".join(lines) + "\n"
+
+def mark_process_dead(pid: int) -> None:
+    """Drops an exited worker's gauges; its counters are kept so totals stay monotonic."""
+    path = Path(settings.METRICS_DIR) / f"gauges_{pid}.db"
+    if path.exists():
+        path.unlink()
+
+def clear_metrics_dir() -> None:
+    """Removes every values file; run once before workers start."""
+    for path in glob.glob(str(Path(settings.METRICS_DIR) / "*.db")):
+        os.remove(path)
+
+_DB_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE", "CREATE", "PRAGMA", "WITH"}
+
+def instrument_engine(engine, database: str) -> None:
+    """Times every statement executed by an (async) engine."""
+    if store is None:
+        return
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        operation = (statement.lstrip()[:9].split(None, 1) or ["OTHER"])[0].upper()
+        DB_QUERY_LATENCY.observe(elapsed, database, operation if operation in _DB_OPERATIONS else "OTHER")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+def route_template(scope) -> Optional[str]:
+    """Finds the path template of the route that will handle a request, to keep label cardinality bounded.
+
+    The result is kept in the scope, so the middlewares that need it match the
+    routes only once per request.
+    """
+    if "route_template" in scope:
+        return scope["route_template"]
+    app = scope.get("app")
+    template = None
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            template = route.path
+            break
+        if match == Match.PARTIAL and template is None:
+            template = route.path
+    scope["route_template"] = template
+    return template
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency histograms and in-flight gauges."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or store is None:
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        route = route_template(scope) or "<unmatched>"
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.increment(1.0, method, route)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.increment(-1.0, method, route)
+            REQUEST_LATENCY.observe(time.perf_counter() - start, method, route, status)
+            publish_cache_stats()
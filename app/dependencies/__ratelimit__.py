@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import math
+import time
+
+import redis.asyncio as redis
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+
+from app.dependencies.__auth__ import decode_token
+from app.dependencies.__config__ import RateLimitRule, settings
+from app.dependencies.__helpers__ import client_ip
+from app.dependencies.__metrics__ import route_template
+from app.dependencies.__redis__ import redis_manager
+
+# GCRA over a single "theoretical arrival time" per key, granting up to ARGV[4] requests at once.
+# Redis's own clock is used so that every worker agrees on time. Returns {granted, retry_after}.
+GCRA_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local period = tonumber(ARGV[3])
+local wanted = tonumber(ARGV[4])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local granted = math.min(wanted, math.floor((now + tolerance + interval - tat) / interval))
+if granted < 1 then
+    return {0, string.format('%.6f', tat - tolerance - now)}
+end
+tat = tat + granted * interval
+redis.call('SET', KEYS[1], string.format('%.6f', tat), 'PX', math.ceil((tat - now + period) * 1000))
+return {granted, '0'}
+"""
+
+class LocalBucket:
+    """Requests granted by Redis ahead of time, spent locally until used up or expired."""
+
+    __slots__ = ("tokens", "expires_at", "blocked_until")
+
+    def __init__(self):
+        self.tokens = 0
+        self.expires_at = 0.0
+        self.blocked_until = 0.0
+
+class RateLimiter:
+    """Distributed GCRA rate limiting with a per-worker lease of pre-approved requests.
+
+    Each decision in Redis may grant up to ``rule.lease`` requests at once; the
+    worker spends them from a local bucket for at most ``lease_ttl`` seconds,
+    so a busy but well-behaved client only reaches Redis once per lease. A
+    denial is remembered locally until its retry time, so a flooding client
+    does not reach Redis either. Leased requests are charged up front, so the
+    limit is never exceeded, at the cost of up to ``lease - 1`` requests per
+    worker going unused when a client stops.
+    """
+
+    def __init__(self, rules: list[RateLimitRule], lease_ttl: float):
+        self.rules = rules
+        self.lease_ttl = lease_ttl
+        self.buckets = {}
+        self.script = None
+        self.local_decisions = 0
+        self.redis_decisions = 0
+        self.limited = 0
+        self.failed_open = 0
+        self._next_purge = 0.0
+        self._next_warning = 0.0
+
+    def match(self, scope) -> tuple:
+        route = route_template(scope) or "<unmatched>"
+        method = scope["method"]
+        for index, rule in enumerate(self.rules):
+            if rule.route in ("*", route) and (not rule.methods or method in rule.methods):
+                return index, rule
+        return None, None
+
+    def identify(self, scope, rule: RateLimitRule) -> str:
+        if rule.key == "api_key":
+            api_key = Headers(scope=scope).get("x-api-key")
+            if api_key:
+                return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:32]
+        elif rule.key == "user":
+            authorization = Headers(scope=scope).get("authorization", "")
+            if authorization.lower().startswith("bearer "):
+                try:
+                    subject = decode_token(authorization[7:]).get("sub")
+                except Exception:
+                    subject = None
+                if subject:
+                    return "user:" + subject
+        return "ip:" + client_ip(scope)
+
+    async def check(self, scope) -> float:
+        """Returns 0 when the request may proceed, otherwise the seconds until it may be retried."""
+        index, rule = self.match(scope)
+        if rule is None:
+            return 0.0
+        key = f"ratelimit:{index}:{self.identify(scope, rule)}"
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self._purge(now)
+            bucket = self.buckets[key] = LocalBucket()
+
+        if bucket.blocked_until > now:
+            self.local_decisions += 1
+            self.limited += 1
+            return bucket.blocked_until - now
+        if bucket.tokens > 0 and bucket.expires_at > now:
+            bucket.tokens -= 1
+            self.local_decisions += 1
+            return 0.0
+
+        self.redis_decisions += 1
+        interval = rule.period / rule.limit
+        try:
+            if self.script is None:
+                self.script = redis_manager.client.register_script(GCRA_SCRIPT)
+            granted, retry_after = await self.script(
+                keys=[key],
+                args=[interval, interval * (rule.burst - 1), rule.period, rule.lease]
+            )
+        except redis.RedisError as e:
+            self.failed_open += 1
+            if now >= self._next_warning:
+                self._next_warning = now + 10
+                logging.warning(f"Rate limiter unavailable, allowing requests: {str(e)}")
+            return 0.0
+
+        granted, retry_after = int(granted), float(retry_after)
+        if granted < 1:
+            self.limited += 1
+            bucket.blocked_until = now + retry_after
+            bucket.tokens = 0
+            return max(retry_after, 0.001)
+        bucket.tokens = granted - 1
+        bucket.expires_at = now + self.lease_ttl
+        return 0.0
+
+    def _purge(self, now: float) -> None:
+        # Runs at most once per lease_ttl, when a new key shows up
+        if now < self._next_purge:
+            return
+        self._next_purge = now + self.lease_ttl
+        self.buckets = {
+            key: bucket for key, bucket in self.buckets.items()
+            if bucket.blocked_until > now or (bucket.tokens > 0 and bucket.expires_at > now)
+        }
+
+    def stats(self) -> dict:
+        """Returns decision counters for this worker."""
+        return {
+            "local_decisions": self.local_decisions,
+            "redis_decisions": self.redis_decisions,
+            "limited": self.limited,
+            "failed_open": self.failed_open,
+            "tracked_keys": len(self.buckets),
+        }
+
+rate_limiter = RateLimiter(rules=settings.RATE_LIMIT_RULES, lease_ttl=settings.RATE_LIMIT_LEASE_TTL)
+
+class RateLimitMiddleware:
+    """Rejects requests over their rule's limit with 429 and a Retry-After header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        retry_after = await rate_limiter.check(scope)
+        if retry_after:
+            response = JSONResponse(
+                {"detail": "Too many requests. Please slow down."},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+            return await response(scope, receive, send)
+        await self.app(scope, receive, send)
@@ -1,62 +1,527 @@
 import asyncio
 import gzip
+import hashlib
 import json
 import logging
+import random
+import time
 import redis.asyncio as redis
 
-from fastapi import Request
-from fastapi.responses import JSONResponse
+from collections import deque
+from fastapi import Request, Response
 from functools import wraps
+from typing import Iterable, Optional
+from urllib.parse import urlencode
+from redis.asyncio.client import Pipeline
 
+from app.dependencies.__cache__ import TTLCache
 from app.dependencies.__config__ import settings
+from app.dependencies.__metrics__ import REDIS_COMMAND_LATENCY
+
+L1_INVALIDATION_CHANNEL = "cache:l1:invalidate"
+
+# Response cache entries live under CACHE_PREFIX + "<namespace>:", their tag sets under CACHE_TAG_PREFIX
+CACHE_PREFIX = "cache:"
+CACHE_TAG_PREFIX = "cache:tag:"
+
+# Stores an entry and records it in each tag's sorted set, scored by when the entry expires.
+# Members whose entries have expired are trimmed on the way, and a set lives as long as its
+# longest-lived member, so neither outgrows the entries it points to.
+TAG_SCRIPT = """
+local lifetime = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+if lifetime > 0 then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', lifetime)
+else
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+for i = 2, #KEYS do
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', now)
+    local ttl = redis.call('TTL', KEYS[i])
+    if lifetime > 0 then
+        redis.call('ZADD', KEYS[i], now + lifetime, KEYS[1])
+        if ttl == -2 or (ttl >= 0 and ttl < lifetime) then
+            redis.call('EXPIRE', KEYS[i], lifetime)
+        end
+    else
+        redis.call('ZADD', KEYS[i], '+inf', KEYS[1])
+        redis.call('PERSIST', KEYS[i])
+    end
+end
+return #KEYS - 1
+"""
+
+class RedisUnavailable(redis.ConnectionError):
+    """Raised without touching the network while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """Stops calling Redis after repeated connection failures so requests fail fast.
+
+    After ``failure_threshold`` failures within ``window`` seconds the breaker
+    opens and every call raises RedisUnavailable immediately. Once
+    ``reset_timeout`` has passed it half-opens and lets ``half_open_probes``
+    calls through; a success closes it again, a failure re-opens it. Only
+    connection-level errors count: a server that answers with an error is up,
+    and running out of pooled connections only means this worker is busy.
+    """
+
+    FAILURES = (redis.ConnectionError, redis.TimeoutError, ConnectionError, TimeoutError, OSError)
+    # Raised by the connection pools on checkout, before any socket is touched
+    POOL_EXHAUSTED = ("No connection available.", "Too many connections")
+
+    def __init__(self, failure_threshold: int, window: float, reset_timeout: float, half_open_probes: int):
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.state = "closed"
+        self.failures = deque()
+        self.opened_at = None
+        self.probes = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self.probes = 0
+        if self.probes < self.half_open_probes:
+            self.probes += 1
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self.state == "half_open":
+            logging.info("Redis circuit breaker closed")
+        self.state = "closed"
+        self.failures.clear()
+        self.probes = 0
+
+    def record_failure(self) -> None:
+        now = time.monotonic()
+        if self.state == "half_open":
+            self._open(now)
+            return
+        self.failures.append(now)
+        while self.failures and now - self.failures[0] > self.window:
+            self.failures.popleft()
+        if self.state == "closed" and len(self.failures) >= self.failure_threshold:
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = "open"
+        self.opened_at = now
+        self.probes = 0
+        self.times_opened += 1
+        logging.error(f"Redis circuit breaker opened for {self.reset_timeout}s")
+
+    async def call(self, func, *args, **kwargs):
+        if not self.allow():
+            self.rejected += 1
+            raise RedisUnavailable("Redis circuit breaker is open")
+        try:
+            result = await func(*args, **kwargs)
+        except self.FAILURES as e:
+            if isinstance(e, redis.ConnectionError) and str(e) in self.POOL_EXHAUSTED:
+                if self.state == "half_open":
+                    self.probes = max(self.probes - 1, 0)
+                raise
+            self.record_failure()
+            raise
+        except redis.ResponseError:
+            self.record_success()
+            raise
+        except BaseException:
+            # Cancelled or unrelated errors say nothing about Redis health; free the probe slot
+            if self.state == "half_open":
+                self.probes = max(self.probes - 1, 0)
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "recent_failures": len(self.failures),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+class ResilientRedis(redis.Redis):
+    """Redis client whose commands and pipelines all pass through a circuit breaker."""
+
+    breaker: CircuitBreaker = None
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await self.breaker.call(super().execute_command, *args, **options)
+        finally:
+            command = args[0].decode() if isinstance(args[0], bytes) else str(args[0])
+            REDIS_COMMAND_LATENCY.observe(time.perf_counter() - start, command.upper())
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> "ResilientPipeline":
+        pipe = ResilientPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.breaker = self.breaker
+        return pipe
+
+class ResilientPipeline(Pipeline):
+    breaker: CircuitBreaker = None
+
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            return await self.breaker.call(super().execute, raise_on_error)
+        finally:
+            REDIS_COMMAND_LATENCY.observe(time.perf_counter() - start, "MULTI" if self.is_transaction else "PIPELINE")
+
+class CommandBatcher:
+    """Coalesces commands issued close together into one pipelined round trip.
+
+    Commands queued within the same event-loop tick (or within ``window``
+    seconds) are sent as a single non-transactional pipeline in the order they
+    were issued, with each run of consecutive GETs folded into one MGET. Each
+    caller awaits its own future and gets back exactly the result or error of
+    its own command.
+    """
+
+    def __init__(self, client, window: float, max_batch: int):
+        self.client = client
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = []
+        self._flush_handle = None
+        self._flushes = set()
+        self.batches = 0
+        self.commands = 0
+
+    async def execute(self, command: str, *args):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((command, args, future))
+        if len(self._queue) >= self.max_batch:
+            if self._flush_handle:
+                self._flush_handle.cancel()
+            self._start_flush()
+        elif self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            if self.window:
+                self._flush_handle = loop.call_later(self.window, self._start_flush)
+            else:
+                self._flush_handle = loop.call_soon(self._start_flush)
+        return await future
+
+    def _start_flush(self) -> None:
+        self._flush_handle = None
+        batch, self._queue = self._queue, []
+        if batch:
+            task = asyncio.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: list) -> None:
+        self.batches += 1
+        self.commands += len(batch)
+        # Only adjacent GETs are merged, so a read still sees every write queued before it
+        steps = []
+        for command, args, future in batch:
+            if command == "GET" and steps and steps[-1][0] == "MGET":
+                steps[-1][1].append((args[0], future))
+            elif command == "GET":
+                steps.append(("MGET", [(args[0], future)]))
+            else:
+                steps.append((command, (args, future)))
+
+        pipe = self.client.pipeline(transaction=False)
+        for command, payload in steps:
+            if command == "MGET":
+                pipe.mget(list(dict.fromkeys(key for key, _ in payload)))
+            else:
+                pipe.execute_command(command, *payload[0])
+        try:
+            results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (command, payload), result in zip(steps, results):
+            if command != "MGET":
+                outcomes = [(payload[1], result)]
+            elif isinstance(result, Exception):
+                outcomes = [(future, result) for _, future in payload]
+            else:
+                found = dict(zip(dict.fromkeys(key for key, _ in payload), result))
+                outcomes = [(future, found[key]) for key, future in payload]
+            for future, outcome in outcomes:
+                if future.done():
+                    continue
+                if isinstance(outcome, Exception):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "commands": self.commands,
+            "avg_batch_size": round(self.commands / self.batches, 2) if self.batches else 0.0,
+        }
 
 class RedisClientManager:
+    """Pooled Redis client with an optional in-process L1 cache in front of ``get``.
+
+    The L1 tier is kept coherent with Redis 6+ client-side caching: every pooled
+    connection enables ``CLIENT TRACKING`` and redirects invalidation messages
+    to a dedicated connection, so a write from any worker evicts the key here.
+    When tracking is unavailable, or ``REDIS_L1_MODE`` is "pubsub", writes made
+    through this manager are announced on a pub/sub channel instead.
+    """
+
     def __init__(self):
         self.host = settings.redis_host
         self.port = settings.redis_port
         self.password = settings.redis_password
         self.client = None
         self.pool = None
+        self.subscriptions = {}
+        self.listener_task = None
+        self.l1 = None
+        self.l1_mode = None
+        self.l1_active = False
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.tracking_task = None
+        self.batcher = None
+        self.tag_script = None
+        self.subscriber_pool = None
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.REDIS_BREAKER_FAILURES,
+            window=settings.REDIS_BREAKER_WINDOW,
+            reset_timeout=settings.REDIS_BREAKER_RESET_TIMEOUT,
+            half_open_probes=settings.REDIS_BREAKER_HALF_OPEN_PROBES
+        )
+        self._tracking_client_id = None
+        self._l1_generation = 0
+        if settings.REDIS_L1_ENABLED:
+            self.l1 = TTLCache(
+                maxsize=settings.REDIS_L1_MAX_ITEMS,
+                ttl=settings.REDIS_L1_TTL,
+                maxbytes=settings.REDIS_L1_MAX_BYTES
+            )
+            self.l1_mode = settings.REDIS_L1_MODE
+            # Subscribed up front so the fallback works even if tracking turns out to be unsupported
+            self.subscribe(L1_INVALIDATION_CHANNEL, self._on_l1_invalidation)
 
     async def init_client(self) -> None:
         self.pool = redis.ConnectionPool(
             host=self.host,
             port=self.port,
             password=self.password,
-            max_connections=settings.REDIS_MAX_CONNECTIONS
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+            redis_connect_func=self._on_connect
         )
-        self.client = redis.Redis(connection_pool=self.pool)
+        # Subscriber connections block on reads indefinitely, so they get their own pool without a read timeout
+        self.subscriber_pool = redis.ConnectionPool(
+            host=self.host,
+            port=self.port,
+            password=self.password,
+            max_connections=2,
+            socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT
+        )
+        self.client = ResilientRedis(connection_pool=self.pool)
+        self.client.breaker = self.breaker
+        self.tag_script = self.client.register_script(TAG_SCRIPT)
+        if settings.REDIS_AUTO_PIPELINE:
+            self.batcher = CommandBatcher(self.client, settings.REDIS_PIPELINE_WINDOW, settings.REDIS_PIPELINE_MAX_BATCH)
+        if self.subscriptions:
+            self.listener_task = asyncio.create_task(self._listen())
+        if self.l1_mode == "tracking":
+            ready = asyncio.get_running_loop().create_future()
+            self.tracking_task = asyncio.create_task(self._track_invalidations(ready))
+            try:
+                await asyncio.wait_for(asyncio.shield(ready), timeout=2)
+            except asyncio.TimeoutError:
+                logging.warning("Redis client tracking not ready yet; L1 cache disabled until it connects")
+        elif self.l1_mode == "pubsub":
+            self.l1_active = True
 
     async def close_client(self) -> None:
+        for task in (self.listener_task, self.tracking_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self.listener_task = None
+        self.tracking_task = None
         if self.client:
             await self.client.close()
         if self.pool:
             await self.pool.disconnect(inuse_connections=True)
+        if self.subscriber_pool:
+            await self.subscriber_pool.disconnect(inuse_connections=True)
+
+    async def _on_connect(self, connection) -> None:
+        await connection.on_connect()
+        if self._tracking_client_id is not None:
+            await connection.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", self._tracking_client_id)
+            await connection.read_response()
+
+    async def _track_invalidations(self, ready: asyncio.Future) -> None:
+        """Holds the connection that receives ``__redis__:invalidate`` messages for the pool."""
+        while True:
+            tracker = self.subscriber_pool.make_connection()
+            try:
+                await tracker.connect()
+                await tracker.send_command("CLIENT", "ID")
+                client_id = await tracker.read_response()
+                # Fails with a ResponseError on servers without client-side caching support
+                await self.client.execute_command("CLIENT", "TRACKING", "ON", "REDIRECT", client_id)
+                await tracker.send_command("SUBSCRIBE", "__redis__:invalidate")
+                await tracker.read_response()
+                # Reconnect pooled connections so they all redirect to the new tracker
+                self._tracking_client_id = client_id
+                await self._reconnect_idle_connections()
+                self._reset_l1()
+                self.l1_active = True
+                if not ready.done():
+                    ready.set_result(True)
+                while True:
+                    message = await tracker.read_response(timeout=None)
+                    if message and message[0] == b"message":
+                        self._on_l1_invalidation(message[2])
+            except asyncio.CancelledError:
+                raise
+            except redis.ResponseError as e:
+                logging.warning(f"Redis client tracking unsupported, using pub/sub L1 invalidation: {str(e)}")
+                self.l1_mode = "pubsub"
+                self._tracking_client_id = None
+                self._reset_l1()
+                self.l1_active = True
+                if not ready.done():
+                    ready.set_result(False)
+                return
+            except (redis.RedisError, ConnectionError, OSError) as e:
+                logging.warning(f"Redis invalidation tracker disconnected: {str(e)}")
+                self.l1_active = False
+                self._tracking_client_id = None
+                self._reset_l1()
+                await asyncio.sleep(1)
+            finally:
+                await tracker.disconnect()
+
+    async def _reconnect_idle_connections(self) -> None:
+        """Drops every pooled connection opened before the current tracker, without interrupting commands in flight.
+
+        Connections busy with a command are left alone and dropped once they
+        are back in the pool; until then they are not tracked, so the L1 tier
+        stays off.
+        """
+        self.l1_active = False
+        busy = set(self.pool._in_use_connections)
+        await self.pool.disconnect(inuse_connections=False)
+        while busy:
+            await asyncio.sleep(0.01)
+            for connection in [c for c in busy if c not in self.pool._in_use_connections]:
+                busy.discard(connection)
+                await connection.disconnect()
+
+    def _reset_l1(self) -> None:
+        self._l1_generation += 1
+        self.l1.clear()
+
+    def _on_l1_invalidation(self, keys) -> None:
+        if isinstance(keys, str):
+            keys = json.loads(keys)
+        # None means everything may be stale (flush, or missed messages after a reconnect)
+        if keys is None:
+            self._reset_l1()
+            return
+        self._l1_generation += 1
+        for key in keys:
+            self.l1.pop(key.decode() if isinstance(key, bytes) else key)
+
+    async def _invalidate_l1(self, *keys: str) -> None:
+        if self.l1 is None:
+            return
+        self._l1_generation += 1
+        for key in keys:
+            self.l1.pop(key)
+        if self.l1_mode == "pubsub":
+            await self.publish(L1_INVALIDATION_CHANNEL, json.dumps(keys))
+
+    async def _execute(self, command: str, *args):
+        """Runs a single command, through the auto-pipelining batcher when it is enabled."""
+        if self.batcher:
+            return await self.batcher.execute(command, *args)
+        return await self.client.execute_command(command, *args)
+
+    async def _get_with_ttl(self, key: str):
+        """Reads a key together with its remaining lifetime in seconds (None if it never expires)."""
+        if self.batcher:
+            value, pttl = await asyncio.gather(self._execute("GET", key), self._execute("PTTL", key))
+        else:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.pttl(key)
+            value, pttl = await pipe.execute()
+        # PTTL is -1 for a key without expiry and -2 once it is gone
+        return value, (None if pttl == -1 else max(pttl, 0) / 1000)
 
     async def get(self, key: str) -> str:
-        return await retry_operation(lambda: self.client.get(key))
+        generation = None
+        if self.l1_active:
+            value = self.l1.get(key)
+            if value is not None:
+                return value
+            generation = self._l1_generation
+        # Tracking mode is told when a key expires; with pub/sub the copy must not outlive the Redis TTL
+        ttl = None
+        if generation is not None and self.l1_mode == "pubsub":
+            value, ttl = await retry_operation(lambda: self._get_with_ttl(key))
+        else:
+            value = await retry_operation(lambda: self._execute("GET", key))
+        if value is None:
+            self.l2_misses += 1
+        else:
+            self.l2_hits += 1
+            # Skip the fill if an invalidation arrived while the read was in flight
+            if generation == self._l1_generation and self.l1_active:
+                self.l1.set(key, value, ttl=ttl if ttl is None else min(ttl, self.l1.ttl))
+        return value
 
     async def set(self, key: str, value: str) -> None:
-        await retry_operation(lambda: self.client.set(key, value))
+        await retry_operation(lambda: self._execute("SET", key, value))
+        await self._invalidate_l1(key)
 
     async def setex(self, key: str, expiration: int, value: str) -> None:
         try:
-            await self.client.setex(key, expiration, value)
+            await self._execute("SETEX", key, expiration, value)
         except redis.RedisError as e:
             logging.error(f"Redis error setting key with expiration {key}: {str(e)}")
+        await self._invalidate_l1(key)
     
     async def set_compressed_cache(self, key: str, data: bytes, expiration: int = None):
-        if isinstance(data, bytes):
-            data = data.decode('utf-8')
-        
-        compressed_data = gzip.compress(json.dumps(json.loads(data)).encode('utf-8'))
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        # Already-encoded bodies are compressed as-is; no need to parse and re-serialize them
+        compressed_data = gzip.compress(data, compresslevel=settings.CACHE_COMPRESSION_LEVEL)
         if expiration:
-            await redis_manager.setex(key, expiration, compressed_data)
+            await self.setex(key, expiration, compressed_data)
         else:
-            await redis_manager.set(key, compressed_data)
+            await self.set(key, compressed_data)
 
     async def get_compressed_cache(self, key: str):
-        compressed_data = await redis_manager.get(key)
+        compressed_data = await self.get(key)
         if compressed_data:
             return json.loads(gzip.decompress(compressed_data).decode('utf-8'))
         return None
@@ -64,21 +529,140 @@ class RedisClientManager:
 
     async def exists(self, key: str) -> bool:
         try:
-            return await self.client.exists(key)
+            return await self._execute("EXISTS", key)
         except redis.RedisError as e:
             logging.error(f"Redis error checking existence of key {key}: {str(e)}")
             return False
 
     async def delete(self, key: str) -> None:
         try:
-            await self.client.delete(key)
+            await self._execute("DEL", key)
         except redis.RedisError as e:
             logging.error(f"Redis error deleting key {key}: {str(e)}")
+        await self._invalidate_l1(key)
+
+    async def set_tagged(self, key: str, value: bytes, expiration: int = None, tags: tuple = ()) -> None:
+        """Stores a value and adds its key to the set of every tag, so invalidate_tags can find it."""
+        try:
+            await self.tag_script(
+                keys=[key, *(CACHE_TAG_PREFIX + tag for tag in tags)],
+                args=[value, expiration or 0, time.time()]
+            )
+        except redis.RedisError as e:
+            logging.error(f"Redis error setting tagged key {key}: {str(e)}")
+        await self._invalidate_l1(key)
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Drops every entry stored under any of the tags, with UNLINK so Redis frees them off the main thread."""
+        tag_keys = [CACHE_TAG_PREFIX + tag for tag in tags]
+        if not tag_keys:
+            return 0
+        try:
+            # Reading and dropping the sets in one transaction keeps entries tagged meanwhile from being lost
+            async with self.client.pipeline(transaction=True) as pipe:
+                for tag_key in tag_keys:
+                    pipe.zrangebyscore(tag_key, time.time(), "+inf")
+                pipe.unlink(*tag_keys)
+                *members, _ = await pipe.execute()
+            keys = list(dict.fromkeys(key.decode() for group in members for key in group))
+            for start in range(0, len(keys), 500):
+                await self.client.unlink(*keys[start:start + 500])
+        except redis.RedisError as e:
+            logging.error(f"Redis error invalidating cache tags {', '.join(tags)}: {str(e)}")
+            return 0
+        await self._invalidate_l1(*keys)
+        return len(keys)
+
+    async def purge(self, pattern: str) -> int:
+        """Unlinks every key matching a glob pattern, walking the keyspace with SCAN instead of blocking Redis."""
+        removed = 0
+        try:
+            batch = []
+            async for key in self.client.scan_iter(match=pattern, count=1000):
+                batch.append(key)
+                if len(batch) >= 500:
+                    removed += await self.client.unlink(*batch)
+                    batch = []
+            if batch:
+                removed += await self.client.unlink(*batch)
+        except redis.RedisError as e:
+            logging.error(f"Redis error purging keys matching {pattern}: {str(e)}")
+            raise
+        finally:
+            if self.l1 is not None:
+                self._reset_l1()
+            if self.l1_mode == "pubsub":
+                await self.publish(L1_INVALIDATION_CHANNEL, json.dumps(None))
+        return removed
+
+    async def purge_namespace(self, namespace: str) -> int:
+        """Drops every response cache entry in a namespace."""
+        return await self.purge(f"{CACHE_PREFIX}{namespace}:*")
+
+    def cache_stats(self) -> dict:
+        """Returns hit rates for the in-process L1 tier and for Redis reads on this worker."""
+        lookups = self.l2_hits + self.l2_misses
+        return {
+            "l1": self.l1.stats() if self.l1 is not None else None,
+            "l1_mode": self.l1_mode,
+            "l1_active": self.l1_active,
+            "l2": {
+                "hits": self.l2_hits,
+                "misses": self.l2_misses,
+                "hit_rate": round(self.l2_hits / lookups, 4) if lookups else 0.0,
+            },
+            "pipeline": self.batcher.stats() if self.batcher else None,
+        }
+
+    def subscribe(self, channel: str, handler) -> None:
+        """Registers a handler for messages published on a channel by any worker.
+
+        Handlers are plain callables taking the decoded message. After the listener
+        loses its connection and resubscribes they are called with ``None``, since
+        messages sent in the meantime were missed and local state should be reset.
+        """
+        self.subscriptions.setdefault(channel, []).append(handler)
+
+    async def publish(self, channel: str, message: str) -> None:
+        try:
+            await self.client.publish(channel, message)
+        except redis.RedisError as e:
+            logging.error(f"Redis error publishing to channel {channel}: {str(e)}")
+
+    def _dispatch(self, channel: str, message) -> None:
+        for handler in self.subscriptions.get(channel, ()):
+            try:
+                handler(message)
+            except Exception:
+                logging.exception(f"Subscription handler for channel {channel} failed")
+
+    async def _listen(self) -> None:
+        missed_messages = False
+        while True:
+            pubsub = redis.Redis(connection_pool=self.subscriber_pool).pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(*self.subscriptions)
+                if missed_messages:
+                    for channel in self.subscriptions:
+                        self._dispatch(channel, None)
+                    missed_messages = False
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._dispatch(message["channel"].decode(), message["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except (redis.RedisError, ConnectionError, OSError) as e:
+                logging.warning(f"Redis subscription listener disconnected: {str(e)}")
+                missed_messages = True
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
 
     async def clear_all_cache(self) -> None:
+        # Only the response cache; sessions, revocations and rate limits share this database
         try:
-            await self.client.flushdb()
-            logging.info("Redis database cleared successfully.")
+            removed = await self.purge(f"{CACHE_PREFIX}*")
+            logging.info(f"Response cache cleared successfully ({removed} keys).")
         except redis.RedisError as e:
             logging.error(f"Failed to clear Redis database: {str(e)}")
             raise  # Re-raise after logging
@@ -100,76 +684,270 @@ class RedisClientManager:
 
 redis_manager = RedisClientManager()
 
-async def retry_operation(operation, retries=3, delay=1):
+async def retry_operation(operation, retries=3, delay=None, deadline=None):
+    """Retries transient failures with jittered exponential backoff, never past ``deadline`` seconds."""
+    delay = settings.REDIS_RETRY_BASE_DELAY if delay is None else delay
+    deadline = time.monotonic() + (settings.REDIS_RETRY_DEADLINE if deadline is None else deadline)
     for i in range(retries):
         try:
             return await operation()
+        except RedisUnavailable:
+            raise  # The breaker is open; retrying would only add latency
         except (redis.RedisError, ConnectionError, TimeoutError) as e:
-            if i < retries - 1:
-                logging.warning(f"Retrying operation due to: {str(e)}")
-                await asyncio.sleep(delay)
-                delay *= 2
-            else:
+            backoff = random.uniform(0, delay * 2 ** i)
+            if i == retries - 1 or time.monotonic() + backoff > deadline:
                 raise e
+            logging.warning(f"Retrying operation due to: {str(e)}")
+            await asyncio.sleep(backoff)
 
-def cache_response(expiration: int = None):
-    def decorator(func):
-        @wraps(func)
-        async def wrapper(request: Request, *args, **kwargs):
-            # Generate a cache key based on the function name and path parameters
-            cache_key = func.__name__.lower()
+# In-flight cache rebuilds on this worker, so concurrent misses share one handler call
+_inflight_rebuilds: dict[str, asyncio.Future] = {}
 
-            path_params = request.path_params
-            if path_params:
-                cache_key += "_" + "_".join(str(v).lower() for v in path_params.values())
+def _principal(request: Request) -> Optional[str]:
+    """Who the response is for: set by the auth dependencies, else derived from the credentials sent."""
+    principal = getattr(request.state, "principal", None)
+    if principal is None:
+        authorization = request.headers.get("authorization")
+        if authorization:
+            principal = "credential:" + hashlib.sha256(authorization.encode()).hexdigest()[:32]
+    return principal
 
-            # Check if the response is already cached
-            cached_data = await redis_manager.get(cache_key)
-            if cached_data:
-                try:
-                    return JSONResponse(content=json.loads(cached_data))
-                except json.JSONDecodeError:
-                    # If cached data is not valid JSON, ignore it and proceed to regenerate
-                    pass
+def _cache_key(func, request: Request, namespace: str, query_params: frozenset, principal: Optional[str]) -> str:
+    # <prefix><namespace>:<handler>:<path params>:<query params>:<principal>, with every part in a stable order
+    path = urlencode(sorted((name, str(value)) for name, value in request.path_params.items()))
+    query = urlencode(sorted(
+        (name, value) for name, value in request.query_params.multi_items() if name in query_params
+    ))
+    return f"{CACHE_PREFIX}{namespace}:{func.__name__.lower()}:{path}:{query}:{principal or 'shared'}"
+
+def _pack_entry(header: dict, body: bytes) -> bytes:
+    """Prefixes a cached body with a small header describing how it is encoded and when it turns stale."""
+    return b"v1 " + json.dumps(header).encode() + b"\n" + body
+
+def _unpack_entry(raw: bytes):
+    """Splits a cached entry into (header, body); returns None for unrecognised data."""
+    if not raw or not raw.startswith(b"v1 "):
+        return None
+    header, _, body = raw[3:].partition(b"\n")
+    try:
+        return json.loads(header), body
+    except json.JSONDecodeError:
+        return None
+
+async def _single_flight(cache_key: str, rebuild):
+    """Runs ``rebuild`` once per key on this worker; concurrent callers await the same result."""
+    future = _inflight_rebuilds.get(cache_key)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight_rebuilds[cache_key] = future
+    try:
+        result = await rebuild()
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Mark as retrieved when nobody else was waiting
+        raise
+    finally:
+        _inflight_rebuilds.pop(cache_key, None)
+        if not future.done():
+            future.cancel()
 
-            # If not cached or invalid, call the function and cache its response
-            response = await func(request, *args, **kwargs)
+async def _wait_for_peer(cache_key: str):
+    """Polls for an entry that another worker is rebuilding, giving up after CACHE_LOCK_WAIT."""
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        try:
+            entry = _unpack_entry(await redis_manager.get(cache_key))
+        except redis.RedisError:
+            return None
+        if entry:
+            return entry
+    return None
+
+# Response headers that describe a single transfer or a single client, so they are never stored with an entry
+_UNCACHED_HEADERS = {"content-length", "content-type", "content-encoding", "transfer-encoding", "set-cookie"}
+
+def _entry_response(request: Request, header: dict, body: bytes) -> Response:
+    """Sends stored bytes without parsing them, decompressing only for clients that cannot take gzip."""
+    media_type = header.get("content_type", "application/json")
+    headers = dict(header.get("headers", ()))
+    if header.get("encoding") != "gzip":
+        # Same bytes until the entry changes, so the compression middleware may reuse its output
+        request.state.cacheable_body = True
+        return Response(content=body, media_type=media_type, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        response = Response(content=body, media_type=media_type, headers=headers)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(content=gzip.decompress(body), media_type=media_type, headers=headers)
+    response.headers.add_vary_header("Accept-Encoding")
+    return response
+
+async def _rebuild_entry(cache_key: str, compute, compress: bool, expiration: int, soft_expiration: int, tags: tuple = (), wait_for_peer: bool = True):
+    """Recomputes an entry while holding a short Redis lock so that one worker rebuilds each key.
 
-            # Store response in cache
-            if expiration:
-                await redis_manager.setex(cache_key, expiration, response.body)
+    Returns ``(header, body, response)``: ``response`` is the handler's own
+    response when it was computed here, and ``header`` is None when that
+    response was not cacheable. Callers that lose the lock wait briefly for the
+    winner's entry, and compute it themselves if it never shows up; with
+    ``wait_for_peer`` False they return None instead.
+    """
+    lock = redis_manager.client.lock(f"lock:{cache_key}", timeout=settings.CACHE_LOCK_TIMEOUT, blocking=False)
+    try:
+        acquired = await lock.acquire()
+    except redis.RedisError as e:
+        logging.warning(f"Failed to acquire cache lock for {cache_key}: {str(e)}")
+        acquired = None
+
+    if acquired is False:
+        if not wait_for_peer:
+            return None
+        entry = await _wait_for_peer(cache_key)
+        if entry is not None:
+            return (*entry, None)
+
+    try:
+        response = await compute()
+        if response.status_code != 200:
+            return None, None, response
+        header = {
+            "content_type": response.media_type or response.headers.get("content-type"),
+            "headers": [[name, value] for name, value in response.headers.items() if name not in _UNCACHED_HEADERS],
+        }
+        body = response.body
+        if compress:
+            header["encoding"] = "gzip"
+            body = gzip.compress(body, compresslevel=settings.CACHE_COMPRESSION_LEVEL)
+        if soft_expiration:
+            header["stale_at"] = time.time() + soft_expiration
+        entry = _pack_entry(header, body)
+        try:
+            if tags:
+                await redis_manager.set_tagged(cache_key, entry, expiration, tags)
+            elif expiration:
+                await redis_manager.setex(cache_key, expiration, entry)
             else:
-                await redis_manager.set(cache_key, response.body)
-            
-            # Return the original response
-            return response
+                await redis_manager.set(cache_key, entry)
+        except redis.RedisError as e:
+            logging.warning(f"Failed to store cache key {cache_key}: {str(e)}")
+        return header, body, response
+    finally:
+        if acquired:
+            try:
+                await lock.release()
+            except redis.RedisError:
+                pass  # The lock already expired; nothing to release
 
-        return wrapper
-    return decorator
+async def _cached_call(request: Request, cache_key: str, compute, compress: bool, expiration: int, soft_expiration: int, tags: tuple = ()):
+    """Serves a cached response, rebuilding misses once per key and refreshing stale entries within a request.
+
+    A request that computes the response gets the handler's own response back,
+    with its status and headers; requests that joined it get the stored entry.
+    A stale entry is rebuilt by the first request to find it, while it still
+    holds its own dependencies, and served as-is to requests arriving meanwhile.
+    When Redis is unreachable (or its circuit breaker is open) this degrades to
+    calling the handler directly.
+    """
+    try:
+        entry = _unpack_entry(await redis_manager.get(cache_key))
+    except redis.RedisError as e:
+        logging.warning(f"Cache unavailable for {cache_key}, calling handler directly: {str(e)}")
+        return await compute()
+
+    computed = None
+
+    async def rebuild(wait_for_peer: bool = True):
+        nonlocal computed
+        outcome = await _rebuild_entry(cache_key, compute, compress, expiration, soft_expiration, tags, wait_for_peer)
+        if outcome is None:
+            return None
+        header, body, computed = outcome
+        return header, body
+
+    if entry:
+        header, body = entry
+        stale_at = header.get("stale_at")
+        if stale_at and time.time() >= stale_at and cache_key not in _inflight_rebuilds:
+            # Another worker holding the lock means it is already refreshing; the stale entry is served then
+            await _single_flight(cache_key, lambda: rebuild(wait_for_peer=False))
+            if computed is not None:
+                return computed
+        try:
+            return _entry_response(request, header, body)
+        except OSError:
+            # If cached data cannot be decompressed, ignore it and proceed to regenerate
+            pass
+
+    entry = await _single_flight(cache_key, rebuild)
+    if entry is None:
+        # Joined a stale refresh that deferred to another worker
+        entry = await rebuild()
+    if computed is not None:
+        return computed
+    if entry[0] is None:
+        # The handler's response was not cacheable and belongs to the request that computed it
+        return await compute()
+    return _entry_response(request, *entry)
+
+def _cache_decorator(compress: bool, expiration: int, soft_expiration: int, namespace: str, query_params: Iterable[str], per_principal: bool, tags: Iterable[str]):
+    selected = frozenset(query_params)
+    tags = tuple(tags)
 
-def cache_response_with_compression(expiration: int = None):
     def decorator(func):
         @wraps(func)
         async def wrapper(request: Request, *args, **kwargs):
-            # Generate cache key based on function name and path parameters
-            cache_key = func.__name__.lower()
-            path_params = request.path_params
-            if path_params:
-                cache_key += "_" + "_".join(str(v).lower() for v in path_params.values())
+            principal = _principal(request) if per_principal else None
+            entry_tags = tuple(tag.format(**request.path_params) for tag in tags)
+            if principal:
+                entry_tags += (principal,)
+            return await _cached_call(
+                request,
+                _cache_key(func, request, namespace, selected, principal),
+                compute=lambda: func(request, *args, **kwargs),
+                compress=compress,
+                expiration=expiration,
+                soft_expiration=soft_expiration,
+                tags=entry_tags
+            )
 
-            # Attempt to retrieve cached data
-            cached_data = await redis_manager.get_compressed_cache(cache_key)
-            if cached_data:
-                return JSONResponse(content=cached_data)
+        return wrapper
+    return decorator
 
-            # Call the function to get fresh data if cache is empty
-            response = await func(request, *args, **kwargs)
+def cache_response(
+    expiration: int = None,
+    soft_expiration: int = None,
+    namespace: str = "responses",
+    query_params: Iterable[str] = (),
+    per_principal: bool = True,
+    tags: Iterable[str] = ()
+):
+    """Caches an endpoint's encoded response body in Redis.
 
-            # Store response in compressed cache
-            await redis_manager.set_compressed_cache(cache_key, response.body, expiration)
+    ``expiration`` is the hard TTL after which the entry is gone. When
+    ``soft_expiration`` is set, the first request to find an older entry
+    rebuilds it, while concurrent requests are still served the stale entry.
+    Only 200 responses are stored; others are returned to their caller as-is.
 
-            # Return the original response
-            return response
+    Keys are built from ``namespace``, the handler, its path parameters, the
+    query parameters named in ``query_params`` (none unless listed, so
+    arbitrary parameters cannot grow the keyspace) and, unless
+    ``per_principal`` is False, the caller. ``tags`` are formatted with
+    the path parameters (e.g. "user:{user_id}") and, with the caller's own
+    principal tag, let ``redis_manager.invalidate_tags`` drop matching entries.
+    """
+    return _cache_decorator(False, expiration, soft_expiration, namespace, query_params, per_principal, tags)
 
-        return wrapper
-    return decorator
+def cache_response_with_compression(
+    expiration: int = None,
+    soft_expiration: int = None,
+    namespace: str = "responses",
+    query_params: Iterable[str] = (),
+    per_principal: bool = True,
+    tags: Iterable[str] = ()
+):
+    """Same as cache_response, but stores the body gzip-compressed and sends it as-is to gzip clients."""
+    return _cache_decorator(True, expiration, soft_expiration, namespace, query_params, per_principal, tags)
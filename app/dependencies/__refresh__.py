@@ -0,0 +1,106 @@
+import hashlib
+import json
+import logging
+import secrets
+import time
+import uuid
+
+from typing import Optional
+
+from app.dependencies.__config__ import settings
+from app.dependencies.__redis__ import redis_manager
+
+class RefreshTokenStore:
+    """Opaque, single-use refresh tokens kept in Redis and rotated on every use.
+
+    A token is ``<family>.<secret>``; only its SHA-256 digest is stored. All
+    tokens descending from one login share a family, whose record names the
+    one token currently valid and whose consumed set holds the digests of the
+    tokens already exchanged. Presenting a consumed token means it was
+    replayed, so the whole family is revoked and the holder of the current
+    token has to sign in again; a token the family never issued is simply
+    rejected. Tokens expire after ``idle_lifetime`` seconds without use and
+    families after ``max_lifetime`` seconds in total.
+    """
+
+    KEY_PREFIX = "auth:refresh:"
+    FAMILY_PREFIX = "auth:refresh:family:"
+    CONSUMED_SUFFIX = ":consumed"
+
+    def __init__(self, idle_lifetime: int, max_lifetime: int):
+        self.idle_lifetime = idle_lifetime
+        self.max_lifetime = max_lifetime
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def _family(token: str) -> str:
+        return token.split(".", 1)[0]
+
+    async def _record(self, family: str) -> Optional[dict]:
+        record = await redis_manager.client.get(self.FAMILY_PREFIX + family)
+        return json.loads(record) if record else None
+
+    async def _store(self, family: str, claims: dict, expires_at: float, consumed: Optional[str] = None) -> str:
+        token = f"{family}.{secrets.token_urlsafe(32)}"
+        digest = self._digest(token)
+        ttl = max(int(min(self.idle_lifetime, expires_at - time.time())), 1)
+        async with redis_manager.client.pipeline(transaction=True) as pipe:
+            pipe.set(self.KEY_PREFIX + digest, json.dumps({"family": family, "claims": claims}), ex=ttl)
+            pipe.set(self.FAMILY_PREFIX + family, json.dumps({"current": digest, "expires_at": expires_at}), ex=ttl)
+            if consumed is not None:
+                pipe.sadd(self.FAMILY_PREFIX + family + self.CONSUMED_SUFFIX, consumed)
+                pipe.expire(self.FAMILY_PREFIX + family + self.CONSUMED_SUFFIX, ttl)
+            await pipe.execute()
+        return token
+
+    async def issue(self, claims: dict) -> str:
+        """Starts a new family for a fresh login and returns its first token."""
+        return await self._store(uuid.uuid4().hex, claims, time.time() + self.max_lifetime)
+
+    async def rotate(self, token: str) -> tuple[Optional[str], Optional[dict]]:
+        """Consumes a token and returns ``(replacement, claims)``, or ``(None, None)`` if it is not valid.
+
+        GETDEL makes consumption atomic, so of two requests racing with the
+        same token only one can succeed.
+        """
+        family = self._family(token)
+        digest = self._digest(token)
+        entry = await redis_manager.client.getdel(self.KEY_PREFIX + digest)
+        if entry is None:
+            if await redis_manager.client.sismember(self.FAMILY_PREFIX + family + self.CONSUMED_SUFFIX, digest):
+                logging.warning(f"Refresh token reuse detected, revoking token family {self._digest(family)[:16]}")
+                await self.revoke_family(family)
+            return None, None
+
+        entry = json.loads(entry)
+        record = await self._record(family)
+        if entry["family"] != family or record is None or record["current"] != digest:
+            return None, None
+        return await self._store(family, entry["claims"], record["expires_at"], consumed=digest), entry["claims"]
+
+    async def revoke_family(self, family: str) -> None:
+        record = await redis_manager.client.getdel(self.FAMILY_PREFIX + family)
+        keys = [self.FAMILY_PREFIX + family + self.CONSUMED_SUFFIX]
+        if record:
+            keys.append(self.KEY_PREFIX + json.loads(record)["current"])
+        await redis_manager.client.delete(*keys)
+
+    async def revoke(self, token: str) -> bool:
+        """Ends the session a refresh token belongs to, e.g. on logout; tokens the family never issued are ignored."""
+        family = self._family(token)
+        digest = self._digest(token)
+        record = await self._record(family)
+        if record is None:
+            return False
+        if record["current"] != digest and not await redis_manager.client.sismember(self.FAMILY_PREFIX + family + self.CONSUMED_SUFFIX, digest):
+            return False
+        await self.revoke_family(family)
+        return True
+
+refresh_tokens = RefreshTokenStore(
+    idle_lifetime=settings.REFRESH_TOKEN_EXPIRE * 86400,
+    max_lifetime=settings.REFRESH_TOKEN_MAX_LIFETIME * 86400
+)
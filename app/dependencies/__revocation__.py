@@ -0,0 +1,81 @@
+import json
+import logging
+import time
+
+import redis.asyncio as redis
+
+from typing import Optional
+
+from app.dependencies.__config__ import settings
+from app.dependencies.__redis__ import redis_manager
+
+class TokenRevocationList:
+    """Revoked token ids, answered from a per-worker copy kept in sync with Redis.
+
+    Revocations live in a sorted set scored by each token's ``exp``, so entries
+    age out with the token they revoke and the set only ever holds tokens that
+    are still valid. Every revocation bumps a revision counter and is published
+    to the other workers; each worker re-reads the set only when the counter has
+    moved, at most once per ``sync_interval`` seconds. Checking a token that was
+    never revoked therefore costs a local dictionary lookup.
+    """
+
+    KEY = "auth:revoked"
+    REVISION_KEY = "auth:revoked:rev"
+    CHANNEL = "auth:revoked"
+
+    def __init__(self, sync_interval: float, max_lifetime: int):
+        self.sync_interval = sync_interval
+        self.max_lifetime = max_lifetime
+        self.revoked = {}
+        self.revision = None
+        self.next_sync = 0.0
+
+    def handle_message(self, message: Optional[str]) -> None:
+        if message is None:
+            self.next_sync = 0.0
+            return
+        jti, exp = json.loads(message)
+        self.revoked[jti] = exp
+
+    async def revoke(self, jti: str, exp: float) -> None:
+        """Revokes a token id until its expiry time (epoch seconds)."""
+        now = time.time()
+        if exp <= now:
+            return
+        self.revoked[jti] = exp
+        async with redis_manager.client.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.KEY, {jti: exp})
+            pipe.zremrangebyscore(self.KEY, "-inf", now)
+            pipe.expire(self.KEY, self.max_lifetime)
+            pipe.incr(self.REVISION_KEY)
+            await pipe.execute()
+        await redis_manager.publish(self.CHANNEL, json.dumps([jti, exp]))
+
+    async def sync(self) -> None:
+        """Reloads the revoked set from Redis if its revision changed since the last sync."""
+        self.next_sync = time.monotonic() + self.sync_interval
+        now = time.time()
+        try:
+            revision = await redis_manager.client.get(self.REVISION_KEY)
+            if revision is not None and revision == self.revision:
+                self.revoked = {jti: exp for jti, exp in self.revoked.items() if exp > now}
+                return
+            entries = await redis_manager.client.zrangebyscore(self.KEY, now, "+inf", withscores=True)
+        except redis.RedisError as e:
+            # Keep answering from the local copy; pub/sub still delivers new revocations
+            logging.warning(f"Failed to sync revoked tokens from Redis: {str(e)}")
+            return
+        self.revoked = {jti.decode(): exp for jti, exp in entries}
+        self.revision = revision
+
+    async def is_revoked(self, jti: str) -> bool:
+        if time.monotonic() >= self.next_sync:
+            await self.sync()
+        return jti in self.revoked
+
+revocation_list = TokenRevocationList(
+    sync_interval=settings.REVOCATION_SYNC_INTERVAL,
+    max_lifetime=settings.JWT_EXPIRE * 3600
+)
+redis_manager.subscribe(TokenRevocationList.CHANNEL, revocation_list.handle_message)
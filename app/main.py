@@ -1,12 +1,15 @@
 from fastapi import FastAPI
 
 # from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 # from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
 # from fastapi.middleware.trustedhost import TrustedHostMiddleware
 
+from app.dependencies.__compression__ import AdaptiveCompressionMiddleware
+from app.dependencies.__concurrency__ import ConcurrencyLimitMiddleware
 from app.dependencies.__config__ import settings
 from app.dependencies.__helpers__ import lifespan
+from app.dependencies.__metrics__ import MetricsMiddleware
+from app.dependencies.__ratelimit__ import RateLimitMiddleware
 
 from app.routers import router_auth, router_index, router_users
 
@@ -29,9 +32,16 @@ def get_app() -> FastAPI:
     #                    allow_methods=["*"],
     #                    allow_headers=["*"],
     #                    )
-    app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=5)
+    app.add_middleware(AdaptiveCompressionMiddleware)
     # app.add_middleware(HTTPSRedirectMiddleware)
     # app.add_middleware(TrustedHostMiddleware, allowed_hosts=["dev.domain.org", "dev.domain.org:8080", "localhost:3000"])
+    if settings.CONCURRENCY_LIMIT_ENABLED:
+        app.add_middleware(ConcurrencyLimitMiddleware)
+    if settings.RATE_LIMIT_ENABLED:
+        app.add_middleware(RateLimitMiddleware)
+    # Added last so it is outermost and times the whole middleware stack
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
 
     # Include various routers
     app.include_router(router_index.router)
@@ -1,5 +1,8 @@
-from pydantic import BaseModel, EmailStr
-from typing import Union
+import ipaddress
+
+from pydantic import BaseModel, EmailStr, TypeAdapter, field_validator
+from typing import Optional, Union
+from typing_extensions import TypedDict
 
 class UserBase(BaseModel):
     username: str
@@ -16,9 +19,44 @@ class UserPublic(UserBase):
     is_admin: bool
     is_active: bool
 
+class UserPublicRecord(TypedDict):
+    """UserPublic as read from the database, serialized without re-validating stored values."""
+    username: str
+    email: Optional[str]
+    first_name: str
+    last_name: str
+    id: int
+    is_admin: bool
+    is_active: bool
+
+USER_PUBLIC_FIELDS = tuple(UserPublicRecord.__annotations__)
+user_record_adapter = TypeAdapter(UserPublicRecord)
+user_records_adapter = TypeAdapter(list[UserPublicRecord])
+
+class UserIdentity(BaseModel):
+    """The subset of user fields needed to authorize a request."""
+    id: int
+    username: str
+    is_admin: bool
+    is_active: bool
+
 class UserCreate(UserBase):
     password: str
 
+class BulkUserCreated(BaseModel):
+    index: int
+    id: int
+    username: str
+
+class BulkUserError(BaseModel):
+    index: int
+    username: Optional[str] = None
+    detail: str
+
+class BulkUserResult(BaseModel):
+    created: list[BulkUserCreated] = []
+    errors: list[BulkUserError] = []
+
 class UserUpdate(UserBase):
     username: Union[str, None] = None
     email: Union[EmailStr, None] = None
@@ -26,4 +64,14 @@ class UserUpdate(UserBase):
     last_name: Union[str, None] = None
     password: Union[str, None] = None
     is_active: Union[bool, None] = None
-    
\ No newline at end of file
+    
+
+class UserAllowedIPs(BaseModel):
+    """Addresses or CIDR networks a user may connect from; an empty list allows any address."""
+    ip_addresses: list[str] = []
+
+    @field_validator("ip_addresses")
+    @classmethod
+    def normalize_networks(cls, values: list[str]) -> list[str]:
+        networks = [str(ipaddress.ip_network(value.strip(), strict=False)) for value in values]
+        return list(dict.fromkeys(networks))
@@ -1,13 +1,15 @@
 from datetime import timedelta
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Form, Request
 from fastapi.security import OAuth2PasswordRequestForm
 
-from app.dependencies.__auth__ import authenticate_user, create_access_token
+from app.dependencies.__auth__ import (
+    authenticate_user, create_access_token, issue_refresh_token, oauth2_scheme, revoke_refresh_token, revoke_token, rotate_refresh_token
+)
 from app.dependencies.__config__ import settings
 from app.dependencies.__database__ import AsyncSession, get_db
-from app.dependencies.__exceptions__ import unauthorized
+from app.dependencies.__exceptions__ import bad_request, no_content, unauthorized
 from app.models.pydantic.token import Token
 
 router = APIRouter(
@@ -17,10 +19,27 @@ router = APIRouter(
 )
 
 @router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: AsyncSession = Depends(get_db)) -> Token:
+async def login_for_access_token(request: Request, form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: AsyncSession = Depends(get_db)) -> Token:
     user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise unauthorized("Could not validate credentials")
+    # Read-your-writes routing follows the user, not the address they signed in from
+    request.state.principal = f"user:{user.id}"
     access_token_expires = timedelta(hours=settings.JWT_EXPIRE)
     access_token = create_access_token(data={"sub": user.username, "userid": int(user.id)}, expires_delta=access_token_expires)
-    return Token(access_token=access_token, token_type="bearer")
\ No newline at end of file
+    refresh_token = await issue_refresh_token(user)
+    return Token(access_token=access_token, refresh_token=refresh_token, token_type="bearer")
+
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(request: Request, refresh_token: Annotated[str, Form()], grant_type: Annotated[str, Form()] = "refresh_token") -> Token:
+    if grant_type != "refresh_token":
+        raise bad_request("Unsupported grant type.")
+    access_token, refresh_token = await rotate_refresh_token(request, refresh_token)
+    return Token(access_token=access_token, refresh_token=refresh_token, token_type="bearer")
+
+@router.post("/logout")
+async def logout(token: Annotated[str, Depends(oauth2_scheme)], refresh_token: Annotated[Optional[str], Form()] = None):
+    await revoke_token(token)
+    if refresh_token:
+        await revoke_refresh_token(refresh_token)
+    raise no_content("Logged out")
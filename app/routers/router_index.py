@@ -1,5 +1,14 @@
 from fastapi import APIRouter, Request
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, Response
+
+from app.dependencies.__allowlist__ import ip_allowlist
+from app.dependencies.__auth__ import token_cache, user_cache
+from app.dependencies.__compression__ import compression_stats
+from app.dependencies.__concurrency__ import concurrency_stats
+from app.dependencies.__database__ import async_engine, pool_stats, replica_router
+from app.dependencies.__metrics__ import render_metrics
+from app.dependencies.__ratelimit__ import rate_limiter
+from app.dependencies.__redis__ import redis_manager
 
 router = APIRouter(
     prefix="",
@@ -16,6 +25,25 @@ async def robots():
     data = "User-agent: *\nDisallow: /"
     return PlainTextResponse(content=data)
 
+@router.get("/health", include_in_schema=False)
+async def health():
+    breaker = redis_manager.breaker.snapshot()
+    return {
+        "status": "ok" if breaker["state"] == "closed" else "degraded",
+        "redis": breaker,
+        "database": pool_stats(async_engine),
+        "auth_cache": {"tokens": token_cache.stats(), "users": user_cache.stats()},
+        "replicas": replica_router.stats(),
+        "compression": compression_stats(),
+        "rate_limit": rate_limiter.stats(),
+        "concurrency": concurrency_stats(),
+        "ip_allowlist": ip_allowlist.stats()
+    }
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @router.get("/client")
 def read_root(request: Request):
     client_host = request.client.host
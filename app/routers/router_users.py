@@ -1,13 +1,24 @@
-from fastapi import APIRouter, Depends
+import json
 
-from typing import Annotated
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 
-from app.dependencies.__auth__ import is_active_user, get_password_hash
-from app.dependencies.__database__ import AsyncSession, get_db, select, IntegrityError
+from typing import Annotated, Optional
+
+from app.dependencies.__allowlist__ import ip_allowlist
+from app.dependencies.__auth__ import is_active_user, get_password_hash, invalidate_user
+from app.dependencies.__config__ import settings
+from app.dependencies.__database__ import AsyncSession, get_db, get_read_db, insert, joinedload, or_, replica_router, select, IntegrityError
 from app.dependencies.__exceptions__ import bad_request, no_content, conflict, unauthorized, forbidden
+from app.dependencies.__hashing__ import HashingOverloaded, HashingTimeout, password_hasher
+from app.dependencies.__helpers__ import etag_matches, not_modified, weak_etag
+from app.dependencies.__redis__ import redis_manager
 
-from app.models.database.account import Users
-from app.models.pydantic.user import UserCreate, UserUpdate, UserPublic
+from app.models.database.account import PublicIP, Users
+from app.models.pydantic.user import UserAllowedIPs, UserCreate, UserUpdate, UserPublic
+from app.models.pydantic.user import USER_PUBLIC_FIELDS, user_record_adapter, user_records_adapter
+from app.models.pydantic.user import BulkUserCreated, BulkUserError, BulkUserResult
 
 router = APIRouter(
     prefix="/users",
@@ -15,45 +26,213 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Only the public columns are selected, so reads skip ORM entities and the identity map
+PUBLIC_COLUMNS = tuple(getattr(Users, field) for field in USER_PUBLIC_FIELDS)
+
+# Responses hold another user's data and must be revalidated, which a matching ETag makes cheap
+USER_CACHE_CONTROL = "private, no-cache"
+
+def user_record(user: Users) -> dict:
+    return {field: getattr(user, field) for field in USER_PUBLIC_FIELDS}
+
+def json_response(body: bytes, **kwargs) -> Response:
+    """Sends already-encoded JSON, bypassing response_model validation and re-encoding."""
+    return Response(content=body, media_type="application/json", **kwargs)
+
 @router.get("/", response_model=list[UserPublic])
-async def read_all_users(token: Annotated[str, Depends(is_active_user)], db: AsyncSession = Depends(get_db)) -> list[UserPublic]:
+async def read_all_users(
+    request: Request,
+    token: Annotated[str, Depends(is_active_user)],
+    limit: Annotated[int, Query(ge=1, le=settings.USERS_MAX_PAGE_SIZE)] = settings.USERS_PAGE_SIZE,
+    after: Annotated[Optional[int], Query(ge=0, description="Return users with an id greater than this cursor")] = None,
+    db: AsyncSession = Depends(get_read_db)
+) -> Response:
     if token.is_admin:
-        result = await db.scalars(select(Users))
-        response = [UserPublic(**user.__dict__) for user in result.all()]
-        return response
+        # Keyset pagination on the primary key; one extra row tells us whether another page exists
+        query = select(*PUBLIC_COLUMNS).order_by(Users.id).limit(limit + 1)
+        if after is not None:
+            query = query.where(Users.id > after)
+
+        rows = (await db.execute(query)).all()
+        # The ETag covers every value sent, so a match skips only the encoding, never a change
+        etag = weak_etag("users", limit, after, *map(tuple, rows))
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag, USER_CACHE_CONTROL)
+        users = [row._asdict() for row in rows]
+        headers = {"ETag": etag, "Cache-Control": USER_CACHE_CONTROL}
+        if len(users) > limit:
+            users = users[:limit]
+            headers["X-Next-Cursor"] = str(users[-1]["id"])
+        return json_response(user_records_adapter.dump_json(users), headers=headers)
     else:
         raise forbidden("Not Allowed. Reading all user information is restricted to Administrators only.")
-    
+
+async def stream_users_ndjson():
+    """Yields every user as NDJSON, reading rows in chunks through a server-side cursor."""
+    # The request-scoped session is closed before a streaming body is sent, so the export owns its session
+    async with replica_router.session() as db:
+        query = select(*PUBLIC_COLUMNS).order_by(Users.id).execution_options(yield_per=settings.USERS_EXPORT_CHUNK_SIZE)
+        result = await db.stream(query)
+        async for users in result.partitions():
+            yield b"".join(user_record_adapter.dump_json(user._asdict()) + b"\n" for user in users)
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_users(token: Annotated[str, Depends(is_active_user)]):
+    if token.is_admin:
+        return StreamingResponse(stream_users_ndjson(), media_type="application/x-ndjson")
+    else:
+        raise forbidden("Not Allowed. Exporting user information is restricted to Administrators only.")
+
+
 @router.post("/", response_model=UserPublic)
-async def create_user(user_data: UserCreate, db: AsyncSession = Depends(get_db)) -> UserPublic:
+async def create_user(request: Request, user_data: UserCreate, db: AsyncSession = Depends(get_db)) -> Response:
     user = Users(
         username=user_data.username,
         first_name=user_data.first_name,
         last_name=user_data.last_name,
         email=user_data.email,
-        hashed_password=get_password_hash(user_data.password)
+        hashed_password=await get_password_hash(user_data.password)
     )
     try:
         db.add(user)
         await db.commit()
         await db.refresh(user)
-        return UserPublic(**user.__dict__)
+        # Pins the new user, not the address they signed up from, to the primary
+        request.state.principal = f"user:{user.id}"
+        return json_response(user_record_adapter.dump_json(user_record(user)))
     except IntegrityError:
         raise conflict("Email or Username already exists")
 
+async def parse_bulk_users(request: Request, result: BulkUserResult) -> list[tuple[int, UserCreate]]:
+    """Parses a JSON array or NDJSON body, recording invalid items as errors instead of failing the batch."""
+    body = await request.body()
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+    if ndjson:
+        # Lines are decoded one at a time below, so a malformed line only fails its own item
+        raw_items = [line for line in body.splitlines() if line.strip()]
+    else:
+        try:
+            raw_items = json.loads(body)
+        except json.JSONDecodeError:
+            raise bad_request("Request body must be a JSON array or NDJSON of users")
+        if not isinstance(raw_items, list):
+            raise bad_request("Request body must be a JSON array or NDJSON of users")
+    if len(raw_items) > settings.USERS_BULK_MAX_ITEMS:
+        raise bad_request(f"A bulk request may contain at most {settings.USERS_BULK_MAX_ITEMS} users")
+
+    items = []
+    for index, raw_item in enumerate(raw_items):
+        if ndjson:
+            try:
+                raw_item = json.loads(raw_item)
+            except json.JSONDecodeError as e:
+                result.errors.append(BulkUserError(index=index, detail=f"Invalid JSON: {e.msg}"))
+                continue
+        try:
+            items.append((index, UserCreate.model_validate(raw_item)))
+        except ValidationError as e:
+            username = raw_item.get("username") if isinstance(raw_item, dict) else None
+            result.errors.append(BulkUserError(index=index, username=username, detail=str(e.errors()[0]["msg"])))
+    return items
+
+async def insert_users_chunk(db: AsyncSession, chunk: list[tuple[int, UserCreate]], result: BulkUserResult) -> None:
+    """Inserts one chunk with a single multi-row INSERT ... RETURNING, reporting conflicts per item."""
+    usernames = [user.username for _, user in chunk]
+    emails = [user.email for _, user in chunk]
+    existing = await db.execute(
+        select(Users.username, Users.email).where(or_(Users.username.in_(usernames), Users.email.in_(emails)))
+    )
+    taken_usernames, taken_emails = set(), set()
+    for username, email in existing:
+        taken_usernames.add(username)
+        taken_emails.add(email)
+
+    pending = []
+    for index, user in chunk:
+        if user.username in taken_usernames or user.email in taken_emails:
+            result.errors.append(BulkUserError(index=index, username=user.username, detail="Email or Username already exists"))
+            continue
+        # Also catches duplicates inside the same request
+        taken_usernames.add(user.username)
+        taken_emails.add(user.email)
+        pending.append((index, user))
+    if not pending:
+        return
+
+    hashed_passwords = await password_hasher.hash_many([user.password for _, user in pending])
+    rows = [
+        {
+            "username": user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "email": user.email,
+            "hashed_password": hashed_password,
+        }
+        for (_, user), hashed_password in zip(pending, hashed_passwords)
+    ]
+    statement = insert(Users).returning(Users.id, Users.username, sort_by_parameter_order=True)
+    try:
+        created = (await db.execute(statement, rows)).all()
+        await db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent writer: retry row by row so only the conflicting items fail
+        await db.rollback()
+        created = []
+        for (index, user), row in zip(pending, rows):
+            try:
+                async with db.begin_nested():
+                    created.append((await db.execute(statement, [row])).one())
+            except IntegrityError:
+                created.append(None)
+                result.errors.append(BulkUserError(index=index, username=user.username, detail="Email or Username already exists"))
+        await db.commit()
+
+    for (index, _), row in zip(pending, created):
+        if row is not None:
+            result.created.append(BulkUserCreated(index=index, id=row.id, username=row.username))
+
+@router.post("/bulk", response_model=BulkUserResult)
+async def create_users_bulk(request: Request, token: Annotated[str, Depends(is_active_user)], db: AsyncSession = Depends(get_db)) -> BulkUserResult:
+    if not token.is_admin:
+        raise forbidden("Not Allowed. Bulk user creation is restricted to Administrators only.")
+
+    result = BulkUserResult()
+    items = await parse_bulk_users(request, result)
+    chunk_size = settings.USERS_BULK_CHUNK_SIZE
+    for start in range(0, len(items), chunk_size):
+        chunk = items[start:start + chunk_size]
+        try:
+            await insert_users_chunk(db, chunk, result)
+        except (HashingOverloaded, HashingTimeout):
+            await db.rollback()
+            # Items of this chunk may already carry an error from the conflict check
+            reported = {error.index for error in result.errors}
+            for index, user in items[start:]:
+                if index not in reported:
+                    result.errors.append(BulkUserError(index=index, username=user.username, detail="Not processed: password hashing is busy"))
+            break
+    result.errors.sort(key=lambda error: error.index)
+    return result
+
 @router.get("/{user_id}", response_model=UserPublic)
-async def read_user(user_id: int, token: Annotated[str, Depends(is_active_user)], db: AsyncSession = Depends(get_db)) -> UserPublic:
+async def read_user(request: Request, user_id: int, token: Annotated[str, Depends(is_active_user)], db: AsyncSession = Depends(get_read_db)) -> Response:
     if token.id == user_id or token.is_admin:
-        result = await db.scalars(select(Users).where(Users.id == user_id))
+        result = await db.execute(select(*PUBLIC_COLUMNS).where(Users.id == user_id))
         user = result.first()
         if not user:
             raise bad_request("User not found")
-        return UserPublic(**user.__dict__)
+        # Built from the public columns themselves, so edits within the same second still change it
+        etag = weak_etag(*user)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag, USER_CACHE_CONTROL)
+        user = user._asdict()
+        headers = {"ETag": etag, "Cache-Control": USER_CACHE_CONTROL}
+        return json_response(user_record_adapter.dump_json(user), headers=headers)
     else:
         raise forbidden("Not Allowed. Reading another user's information is restricted to Administrators only.")
 
 @router.put("/{user_id}", response_model=UserPublic)
-async def update_user(user_id: int, user_data: UserUpdate, token: Annotated[str, Depends(is_active_user)], db: AsyncSession = Depends(get_db)) -> UserPublic:
+async def update_user(user_id: int, user_data: UserUpdate, token: Annotated[str, Depends(is_active_user)], db: AsyncSession = Depends(get_db)) -> Response:
     if token.id == user_id or token.is_admin:
         if user_data.is_active == True and token.is_admin == False:
             raise unauthorized("Not Allowed. Please contact admin to activate user.")
@@ -62,14 +241,20 @@ async def update_user(user_id: int, user_data: UserUpdate, token: Annotated[str,
         if not user_db:
             raise bad_request("User not found")
         
+        previous_username = user_db.username
         update_data = user_data.model_dump(exclude_unset=True)
+        password = update_data.pop("password", None)
+        if password:
+            update_data["hashed_password"] = await get_password_hash(password)
         for key, value in update_data.items():
             if value is not None:
                 setattr(user_db, key, value)
         
         await db.commit()
         await db.refresh(user_db)
-        return UserPublic(**user_db.__dict__)
+        await invalidate_user(previous_username, user_db.username)
+        await redis_manager.invalidate_tags(f"user:{user_id}")
+        return json_response(user_record_adapter.dump_json(user_record(user_db)))
     else:
         raise forbidden("Not Allowed. Changes to another user is restricted to Administrators only.")
 
@@ -82,7 +267,35 @@ async def delete_user(user_id: int, token: Annotated[str, Depends(is_active_user
             raise bad_request("User not found")
         await db.delete(user_db)
         await db.commit()
+        await invalidate_user(user_db.username)
+        await ip_allowlist.changed(user_id)
+        await redis_manager.invalidate_tags(f"user:{user_id}")
         raise no_content("User deleted")
     else:
         raise forbidden("Not Allowed. Deleting another user is restricted to the User & Administrators only.")
-        
+
+@router.get("/{user_id}/ips", response_model=UserAllowedIPs)
+async def read_user_ips(user_id: int, token: Annotated[str, Depends(is_active_user)], db: AsyncSession = Depends(get_read_db)) -> UserAllowedIPs:
+    if token.id == user_id or token.is_admin:
+        result = await db.scalars(select(PublicIP.ip_address).join(PublicIP.users).where(Users.id == user_id))
+        return UserAllowedIPs(ip_addresses=result.all())
+    else:
+        raise forbidden("Not Allowed. Reading another user's information is restricted to Administrators only.")
+
+@router.put("/{user_id}/ips", response_model=UserAllowedIPs)
+async def update_user_ips(user_id: int, allowed: UserAllowedIPs, token: Annotated[str, Depends(is_active_user)], db: AsyncSession = Depends(get_db)) -> UserAllowedIPs:
+    if not token.is_admin:
+        raise forbidden("Not Allowed. Changing IP allowlists is restricted to Administrators only.")
+    result = await db.scalars(select(Users).options(joinedload(Users.public_ips)).where(Users.id == user_id))
+    user_db = result.unique().first()
+    if not user_db:
+        raise bad_request("User not found")
+
+    existing = {}
+    if allowed.ip_addresses:
+        result = await db.scalars(select(PublicIP).where(PublicIP.ip_address.in_(allowed.ip_addresses)))
+        existing = {public_ip.ip_address: public_ip for public_ip in result}
+    user_db.public_ips = [existing.get(ip_address) or PublicIP(ip_address=ip_address) for ip_address in allowed.ip_addresses]
+    await db.commit()
+    await ip_allowlist.changed(user_id)
+    return allowed
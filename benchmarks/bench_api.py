@@ -0,0 +1,287 @@
+"""Offline load benchmark for the auth and users hot paths.
+
+Runs the application in-process against a throwaway SQLite database and a
+local Redis, drives it through httpx's ASGI transport and reports throughput
+and latency percentiles per scenario.
+
+    python -m benchmarks.bench_api --save benchmarks/baselines/local.json
+    python -m benchmarks.bench_api --compare benchmarks/baselines/local.json --threshold 0.15
+
+Redis is taken from --redis-url if given, otherwise a redis-server binary on
+PATH is started on a free port, otherwise fakeredis is used when installed.
+Baselines are only comparable between runs on the same machine and backend.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlparse
+
+SCENARIOS = ("login", "read_user", "list_users", "cached")
+ADMIN_PASSWORD = "benchmark-password"
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario (login uses a tenth)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=100, help="unmeasured requests per scenario")
+    parser.add_argument("--users", type=int, default=1000, help="users seeded into the database")
+    parser.add_argument("--redis-url", help="use this Redis instead of starting one")
+    parser.add_argument("--output", type=Path, help="write this run's results as JSON")
+    parser.add_argument("--save", type=Path, help="write this run's results as the new baseline")
+    parser.add_argument("--compare", type=Path, help="baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed regression as a fraction (0.10 = 10%%)")
+    return parser.parse_args()
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_redis(args: argparse.Namespace, workdir: str):
+    """Points the settings at a Redis and returns ``(backend name, process to stop)``."""
+    if args.redis_url:
+        url = urlparse(args.redis_url)
+        os.environ.update({"REDIS_HOST": url.hostname or "localhost", "REDIS_PORT": str(url.port or 6379), "REDIS_PASSWORD": url.password or ""})
+        return "external", None
+
+    server = shutil.which("redis-server")
+    if server:
+        port = free_port()
+        process = subprocess.Popen(
+            [server, "--port", str(port), "--save", "", "--appendonly", "no", "--dir", workdir],
+            stdout=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+        os.environ.update({"REDIS_HOST": "127.0.0.1", "REDIS_PORT": str(port), "REDIS_PASSWORD": ""})
+        return "redis-server", process
+
+    try:
+        import fakeredis
+        import fakeredis.aioredis
+        import redis.asyncio as redis
+    except ImportError:
+        sys.exit("No Redis available: pass --redis-url, put redis-server on PATH or install fakeredis")
+
+    fake_server = fakeredis.FakeServer()
+
+    def fake_pool(pool_class):
+        def create(*args, **kwargs):
+            for key in ("host", "port", "password"):
+                kwargs.pop(key, None)
+            return pool_class(connection_class=fakeredis.aioredis.FakeConnection, server=fake_server, **kwargs)
+        return create
+
+    redis.ConnectionPool = fake_pool(redis.ConnectionPool)
+    os.environ.update({"REDIS_HOST": "localhost", "REDIS_PORT": "6379", "REDIS_PASSWORD": ""})
+    return "fakeredis", None
+
+def configure_environment(workdir: str) -> None:
+    # Must run before the application is imported, since settings are read at import time
+    os.environ.update({
+        "DATABASE_URL": f"sqlite+aiosqlite:///{workdir}/benchmark.db",
+        "METRICS_ENABLED": os.environ.get("METRICS_ENABLED", "true"),
+        "METRICS_DIR": f"{workdir}/metrics",
+        "SECRET_KEY": os.environ.get("SECRET_KEY", "benchmark-secret-key"),
+        "ALGORITHM": os.environ.get("ALGORITHM", "HS256"),
+        "REDIS_DB": "0",
+        "ADMIN_USERNAME": "admin",
+        "ADMIN_EMAIL": "admin@example.com",
+        "ADMIN_FIRST_NAME": "Bench",
+        "ADMIN_LAST_NAME": "Admin",
+        "ADMIN_PASSWORD": ADMIN_PASSWORD,
+        # Every benchmark request comes from one client, which the rate limits exist to stop
+        "RATE_LIMIT_ENABLED": "false",
+        # Measure the handlers themselves; shedding would turn saturated scenarios into 503s
+        "CONCURRENCY_LIMIT_ENABLED": "false",
+    })
+
+def add_cached_route(app) -> None:
+    """Mounts a cached endpoint, since the shipped routers do not cache any responses."""
+    from fastapi import APIRouter, Request
+    from fastapi.responses import JSONResponse
+    from app.dependencies.__redis__ import cache_response_with_compression
+
+    router = APIRouter()
+
+    @router.get("/benchmark/cached/{item_id}")
+    @cache_response_with_compression(expiration=300)
+    async def cached_item(request: Request, item_id: int):
+        return JSONResponse({"id": item_id, "values": list(range(200))})
+
+    app.include_router(router)
+
+async def seed_users(count: int) -> None:
+    from app.dependencies.__database__ import AsyncSessionLocal, insert
+    from app.dependencies.__hashing__ import password_hasher
+    from app.models.database.account import Users
+
+    hashed_password = await password_hasher.hash(ADMIN_PASSWORD)
+    rows = [
+        {
+            "username": f"user{index}",
+            "first_name": "Bench",
+            "last_name": f"User{index}",
+            "email": f"user{index}@example.com",
+            "hashed_password": hashed_password,
+            "is_active": True,
+        }
+        for index in range(count)
+    ]
+    async with AsyncSessionLocal() as db:
+        for start in range(0, len(rows), 500):
+            await db.execute(insert(Users), rows[start:start + 500])
+        await db.commit()
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[min(len(ordered) - 1, max(int(round(fraction * len(ordered))) - 1, 0))]
+
+async def run_scenario(client, make_request, total: int, concurrency: int, warmup: int) -> dict:
+    for index in range(warmup):
+        await make_request(index)
+
+    latencies = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal issued, errors
+        while issued < total:
+            index = issued
+            issued += 1
+            start = time.perf_counter()
+            response = await make_request(index)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+async def run(args: argparse.Namespace) -> dict:
+    import httpx
+
+    from app.dependencies.__helpers__ import lifespan
+    from app.main import get_app
+
+    app = get_app()
+    add_cached_route(app)
+    results = {}
+
+    async with lifespan(app):
+        await seed_users(args.users)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            login_form = {"username": "admin", "password": ADMIN_PASSWORD}
+            token = (await client.post("/auth/token", data=login_form)).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            user_count = args.users + 1
+
+            scenarios = {
+                "login": lambda index: client.post("/auth/token", data=login_form),
+                "read_user": lambda index: client.get(f"/users/{index % user_count + 1}", headers=headers),
+                "list_users": lambda index: client.get("/users/", params={"limit": 100}, headers=headers),
+                "cached": lambda index: client.get(f"/benchmark/cached/{index % 50}", headers={"Accept-Encoding": "gzip"}),
+            }
+            for name in args.scenarios:
+                # bcrypt makes logins orders of magnitude slower than everything else
+                scale = 10 if name == "login" else 1
+                results[name] = await run_scenario(
+                    client,
+                    scenarios[name],
+                    total=max(args.requests // scale, 1),
+                    concurrency=args.concurrency,
+                    warmup=max(args.warmup // scale, 1)
+                )
+                print(f"{name:>12}: {json.dumps(results[name])}")
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Returns a description of every scenario that regressed beyond the threshold."""
+    regressions = []
+    if baseline["meta"].get("redis") != results["meta"].get("redis"):
+        print(f"warning: baseline used {baseline['meta'].get('redis')}, this run used {results['meta'].get('redis')}")
+    for name, current in results["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            continue
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: {current['errors']} errors (baseline {previous['errors']})")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {current['throughput_rps']} rps (baseline {previous['throughput_rps']})")
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if current[key] > previous[key] * (1 + threshold):
+                regressions.append(f"{name}: {key} {current[key]} (baseline {previous[key]})")
+    return regressions
+
+def main() -> int:
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix="api-benchmark-") as workdir:
+        configure_environment(workdir)
+        backend, redis_process = start_redis(args, workdir)
+        try:
+            scenarios = asyncio.run(run(args))
+        finally:
+            if redis_process:
+                redis_process.terminate()
+                redis_process.wait()
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "redis": backend,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "users": args.users,
+        },
+        "scenarios": scenarios,
+    }
+    for path in (args.output, args.save):
+        if path:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text()), args.threshold)
+        if regressions:
+            print(f"Regressions beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,13 @@
 # import multiprocessing
 import os
+import time
 
 # Socket binding
 bind = 'unix:/var/www/api/run/gunicorn.sock'
 
 # Dynamic worker count based on CPU cores
-workers = 4  # Adjust or leave static as needed
+# WEB_CONCURRENCY is also read by the app to split the database connection budget per worker
+workers = int(os.getenv("WEB_CONCURRENCY", 4))  # Adjust or leave static as needed
 # workers = multiprocessing.cpu_count() * 2 + 1  # Adjust or leave static as needed
 
 # Timeout settings
@@ -27,12 +29,22 @@ if not os.path.exists(log_dir):
 # Keep-alive settings
 keepalive = 5
 
-# Preloading application
-# preload_app = True
+# Preloading application: imported once in the master and shared copy-on-write with the workers
+preload_app = True
 
 def on_starting(server):
-    """Set up worker ID tracking"""
+    """Set up worker ID tracking and run one-time bootstrap in the master"""
     server.worker_id = 0
+    started = time.perf_counter()
+
+    # Metrics files from a previous run would otherwise be summed into this one
+    from app.dependencies.__metrics__ import clear_metrics_dir
+    clear_metrics_dir()
+
+    # Schema creation and admin seeding run here once instead of racing in every worker
+    from app.dependencies.__helpers__ import bootstrap, rss_mb
+    bootstrap()
+    server.log.info(f"Bootstrap finished in {time.perf_counter() - started:.3f}s, master RSS {rss_mb():.1f} MiB")
 
 def post_fork(server, worker):
     """Assign unique ID to each worker"""
@@ -40,6 +52,15 @@ def post_fork(server, worker):
     server.worker_id += 1
     os.environ["WORKER_ID"] = str(worker.worker_id)
 
+    # Each worker opens its own database connections; Redis and thread pools start in the lifespan
+    from app.dependencies.__database__ import discard_inherited_connections
+    discard_inherited_connections()
+
+def child_exit(server, worker):
+    """Stop counting the exited worker's in-flight requests"""
+    from app.dependencies.__metrics__ import mark_process_dead
+    mark_process_dead(worker.pid)
+
 def when_ready(server):
     server.log.info("Gunicorn is ready to receive requests.")
 
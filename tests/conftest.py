@@ -0,0 +1,71 @@
+import os
+import tempfile
+
+import pytest
+
+# Settings are read when the application is first imported, so the environment is set up here
+_workdir = tempfile.mkdtemp(prefix="api-tests-")
+for name, value in {
+    "SECRET_KEY": "test-secret-key",
+    "ALGORITHM": "HS256",
+    "DATABASE_URL": f"sqlite+aiosqlite:///{_workdir}/test.db",
+    "METRICS_ENABLED": "true",
+    "METRICS_DIR": f"{_workdir}/metrics",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "REDIS_DB": "0",
+    "REDIS_PASSWORD": "",
+    "ADMIN_USERNAME": "admin",
+    "ADMIN_EMAIL": "admin@example.com",
+    "ADMIN_FIRST_NAME": "Test",
+    "ADMIN_LAST_NAME": "Admin",
+    "ADMIN_PASSWORD": "admin-password",
+    "BCRYPT_ROUNDS": "4",
+}.items():
+    os.environ.setdefault(name, value)
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+async def fake_redis(monkeypatch):
+    """Points redis_manager at an in-memory fakeredis server for the duration of a test."""
+    fakeredis = pytest.importorskip("fakeredis")
+    # Scripts (rate limiting, cache tags, allowlist revisions) need fakeredis's Lua support
+    pytest.importorskip("lupa")
+    import fakeredis.aioredis
+    import redis.asyncio as redis
+
+    from app.dependencies.__redis__ import redis_manager
+
+    server = fakeredis.FakeServer()
+
+    def fake_pool(pool_class):
+        def create(*args, **kwargs):
+            for key in ("host", "port", "password"):
+                kwargs.pop(key, None)
+            return pool_class(connection_class=fakeredis.aioredis.FakeAsyncRedisConnection, server=server, **kwargs)
+        return create
+
+    monkeypatch.setattr(redis, "ConnectionPool", fake_pool(redis.ConnectionPool))
+    await redis_manager.init_client()
+    try:
+        yield redis_manager
+    finally:
+        await redis_manager.close_client()
+
+@pytest.fixture
+async def database():
+    """Creates the schema in the test SQLite database and removes the users a test added."""
+    from app.dependencies.__database__ import AsyncSessionLocal, Base, async_engine, delete
+    from app.models.database.account import Users
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        yield AsyncSessionLocal
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Users))
+            await db.commit()
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+import redis.asyncio as redis
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.dependencies.__allowlist__ import AllowlistUnavailable, IPAllowlist, NetworkSet
+
+def test_addresses_match_their_networks():
+    networks = NetworkSet(["10.0.0.0/8", "192.168.1.5", "2001:db8::/32"])
+    assert networks.contains("10.200.3.4")
+    assert networks.contains("192.168.1.5")
+    assert not networks.contains("192.168.1.6")
+    assert not networks.contains("11.0.0.1")
+    assert networks.contains("2001:db8:ffff::1")
+    assert not networks.contains("2001:db9::1")
+
+def test_ipv4_mapped_ipv6_addresses_match_ipv4_networks():
+    assert NetworkSet(["10.0.0.0/8"]).contains("::ffff:10.1.2.3")
+
+def test_host_bits_in_a_network_are_ignored():
+    assert NetworkSet(["10.1.2.3/16"]).contains("10.1.200.1")
+
+def test_catch_all_network_matches_every_address_of_its_family():
+    networks = NetworkSet(["0.0.0.0/0"])
+    assert networks.contains("203.0.113.9")
+    assert not networks.contains("2001:db8::1")
+
+def test_invalid_entries_and_addresses_are_ignored():
+    networks = NetworkSet(["not-a-network", "10.0.0.0/8"])
+    assert networks.contains("10.0.0.1")
+    assert not networks.contains("not-an-address")
+    assert not NetworkSet([]).contains("10.0.0.1")
+
+class FakeDatabase:
+    """Stands in for IPAllowlist._load, serving entries from a dict or failing on request."""
+
+    def __init__(self, entries: dict):
+        self.entries = entries
+        self.fail_full_loads = False
+
+    async def load(self, user_ids=None):
+        if user_ids is None:
+            if self.fail_full_loads:
+                raise SQLAlchemyError("database unavailable")
+            return {user_id: list(networks) for user_id, networks in self.entries.items()}
+        return {user_id: list(self.entries.get(user_id, ())) for user_id in user_ids}
+
+def worker(database: FakeDatabase, max_staleness: float = 60) -> IPAllowlist:
+    allowlist = IPAllowlist(sync_interval=0, max_staleness=max_staleness)
+    allowlist._load = database.load
+    return allowlist
+
+@pytest.mark.anyio
+async def test_users_are_checked_one_by_one_until_a_full_load_succeeds(fake_redis):
+    database = FakeDatabase({1: ["10.0.0.0/8"]})
+    database.fail_full_loads = True
+    allowlist = worker(database)
+
+    assert await allowlist.is_allowed(1, "10.1.2.3")
+    assert not await allowlist.is_allowed(1, "192.0.2.1")
+    assert await allowlist.is_allowed(2, "192.0.2.1")
+    assert not allowlist.loaded
+
+@pytest.mark.anyio
+async def test_unreadable_allowlist_refuses_instead_of_allowing(fake_redis):
+    allowlist = IPAllowlist(sync_interval=0, max_staleness=60)
+
+    async def unavailable(user_ids=None):
+        raise SQLAlchemyError("database unavailable")
+
+    allowlist._load = unavailable
+    with pytest.raises(AllowlistUnavailable):
+        await allowlist.is_allowed(1, "10.1.2.3")
+
+@pytest.mark.anyio
+async def test_lost_revision_bump_reaches_other_workers(fake_redis, monkeypatch):
+    database = FakeDatabase({1: ["10.0.0.0/8"]})
+    writer, reader = worker(database), worker(database)
+    assert await reader.is_allowed(1, "10.1.2.3")
+
+    published = []
+
+    async def publish(channel, message):
+        published.append(message)
+
+    async def failing_script(**kwargs):
+        raise redis.ConnectionError("Connection reset by peer")
+
+    monkeypatch.setattr(fake_redis, "publish", publish)
+    writer.script = failing_script
+    database.entries[1] = ["192.0.2.0/24"]
+    await writer.changed(1)
+    assert published == ["full"]
+
+    # The revision did not move, so only the requested full reload picks the change up
+    assert await reader.is_allowed(1, "10.1.2.3")
+    reader.handle_message("full")
+    assert not await reader.is_allowed(1, "10.1.2.3")
+
+@pytest.mark.anyio
+async def test_workers_reload_everything_after_max_staleness(fake_redis):
+    database = FakeDatabase({1: ["10.0.0.0/8"]})
+    reader = worker(database, max_staleness=0.05)
+    assert await reader.is_allowed(1, "10.1.2.3")
+
+    database.entries[1] = ["192.0.2.0/24"]
+    await asyncio.sleep(0.1)
+    assert not await reader.is_allowed(1, "10.1.2.3")
+    assert reader.stats()["full_loads"] == 2
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.dependencies.__redis__ import CommandBatcher, ResilientPipeline
+
+@pytest.mark.anyio
+async def test_interleaved_commands_keep_issue_order(fake_redis):
+    batcher = CommandBatcher(fake_redis.client, window=0, max_batch=256)
+    results = await asyncio.gather(
+        batcher.execute("GET", "k"),
+        batcher.execute("SET", "k", "1"),
+        batcher.execute("GET", "k"),
+        batcher.execute("GET", "other"),
+        batcher.execute("DEL", "k"),
+        batcher.execute("GET", "k"),
+        batcher.execute("SET", "k", "2"),
+        batcher.execute("GET", "k"),
+    )
+    assert results == [None, True, b"1", None, 1, None, True, b"2"]
+    assert batcher.stats()["batches"] == 1
+
+@pytest.mark.anyio
+async def test_only_adjacent_gets_share_an_mget(fake_redis, monkeypatch):
+    batcher = CommandBatcher(fake_redis.client, window=0, max_batch=256)
+    await fake_redis.client.mset({"a": "1", "b": "2"})
+    sent = []
+    execute = ResilientPipeline.execute
+
+    async def record(pipe, raise_on_error=True):
+        sent.extend(args[0] for args, _ in pipe.command_stack)
+        return await execute(pipe, raise_on_error)
+
+    monkeypatch.setattr(ResilientPipeline, "execute", record)
+    results = await asyncio.gather(
+        batcher.execute("GET", "a"),
+        batcher.execute("GET", "b"),
+        batcher.execute("GET", "a"),
+        batcher.execute("SET", "b", "3"),
+        batcher.execute("GET", "b"),
+    )
+    assert results == [b"1", b"2", b"1", True, b"3"]
+    assert sent == ["MGET", "SET", "MGET"]
+
+@pytest.mark.anyio
+async def test_command_error_only_fails_its_caller(fake_redis):
+    batcher = CommandBatcher(fake_redis.client, window=0, max_batch=256)
+    await fake_redis.client.set("k", "text")
+    results = await asyncio.gather(
+        batcher.execute("INCR", "k"),
+        batcher.execute("GET", "k"),
+        return_exceptions=True,
+    )
+    assert isinstance(results[0], Exception)
+    assert results[1] == b"text"
@@ -0,0 +1,75 @@
+import asyncio
+import gc
+
+import pytest
+
+from fastapi import FastAPI
+
+from app.dependencies import __helpers__
+from app.dependencies.__config__ import settings
+from app.dependencies.__database__ import AsyncSessionLocal, async_engine, delete, discard_inherited_connections, dispose_engines, func, select
+from app.dependencies.__hashing__ import password_hasher
+from app.models.database.account import Users
+
+async def count_admins() -> int:
+    try:
+        async with AsyncSessionLocal() as db:
+            return await db.scalar(select(func.count()).select_from(Users).where(Users.username == settings.admin_username))
+    finally:
+        await dispose_engines()
+
+async def remove_users() -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Users))
+            await db.commit()
+    finally:
+        await dispose_engines()
+
+def test_bootstrap_seeds_once_and_leaves_nothing_to_inherit(monkeypatch):
+    monkeypatch.setattr(__helpers__, "bootstrapped", False)
+    try:
+        __helpers__.bootstrap()
+        __helpers__.bootstrap()
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+
+    assert __helpers__.bootstrapped
+    assert password_hasher.executor is None
+    assert async_engine.pool.checkedin() == 0
+    assert async_engine.pool.checkedout() == 0
+    try:
+        assert asyncio.run(count_admins()) == 1
+    finally:
+        asyncio.run(remove_users())
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("bootstrapped, creates", [(True, 0), (False, 1)])
+async def test_worker_skips_schema_creation_after_a_master_bootstrap(monkeypatch, bootstrapped, creates):
+    calls = []
+
+    async def record():
+        calls.append(True)
+
+    monkeypatch.setattr(__helpers__, "bootstrapped", bootstrapped)
+    monkeypatch.setattr(__helpers__, "create_database", record)
+    monkeypatch.setattr(__helpers__.redis_manager, "init_client", lambda: asyncio.sleep(0))
+    monkeypatch.setattr(__helpers__.redis_manager, "close_client", lambda: asyncio.sleep(0))
+    async with __helpers__.lifespan(FastAPI()):
+        pass
+    assert len(calls) == creates
+
+@pytest.mark.anyio
+async def test_inherited_connections_are_dropped_without_closing_them(database):
+    async with async_engine.connect() as conn:
+        inherited = (await conn.get_raw_connection()).driver_connection
+    assert async_engine.pool.checkedin() == 1
+
+    discard_inherited_connections()
+    assert async_engine.pool.checkedin() == 0
+    try:
+        # The parent process would still be using this connection
+        await inherited.execute("SELECT 1")
+    finally:
+        await inherited.close()
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import pytest
+
+from starlette.requests import Request
+
+from app.dependencies.__hashing__ import HashingTimeout, PasswordHasher
+from app.models.pydantic.user import BulkUserResult
+from app.routers.router_users import parse_bulk_users
+
+def make_request(body: bytes, content_type: str) -> Request:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    scope = {"type": "http", "method": "POST", "path": "/users/bulk", "headers": [(b"content-type", content_type.encode())]}
+    return Request(scope, receive)
+
+def user(index: int) -> dict:
+    return {"username": f"user{index}", "email": f"user{index}@example.com", "first_name": "A", "last_name": "B", "password": "secret"}
+
+@pytest.mark.anyio
+async def test_malformed_ndjson_line_fails_only_its_item():
+    body = b"\n".join([json.dumps(user(0)).encode(), b"{not json", b"", json.dumps(user(2)).encode()])
+    result = BulkUserResult()
+    items = await parse_bulk_users(make_request(body, "application/x-ndjson"), result)
+
+    assert [index for index, _ in items] == [0, 2]
+    assert [error.index for error in result.errors] == [1]
+    assert result.errors[0].detail.startswith("Invalid JSON")
+
+@pytest.mark.anyio
+async def test_invalid_items_are_reported_by_index():
+    body = json.dumps([user(0), {"username": "incomplete"}]).encode()
+    result = BulkUserResult()
+    items = await parse_bulk_users(make_request(body, "application/json"), result)
+
+    assert [index for index, _ in items] == [0]
+    assert [(error.index, error.username) for error in result.errors] == [(1, "incomplete")]
+
+@pytest.mark.anyio
+async def test_hash_many_cancels_remaining_hashes_on_failure():
+    hasher = PasswordHasher(workers=4, max_queue=16, timeout=5)
+    cancelled = []
+
+    async def fake_hash(password: str) -> str:
+        if password == "fails":
+            raise HashingTimeout("Password hashing timed out")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(password)
+            raise
+        return password
+
+    hasher.hash = fake_hash
+    with pytest.raises(HashingTimeout):
+        await hasher.hash_many(["slow1", "fails", "slow2"])
+    # Cancelled and awaited before the error reaches the caller
+    assert sorted(cancelled) == ["slow1", "slow2"]
+
+@pytest.mark.anyio
+async def test_items_are_reported_once_when_hashing_gives_up(database, monkeypatch):
+    from app.models.database.account import Users
+    from app.models.pydantic.user import UserIdentity
+    from app.routers import router_users
+
+    async with database() as db:
+        db.add(Users(username="user0", first_name="A", last_name="B", email="user0@example.com", hashed_password="x"))
+        await db.commit()
+
+    async def busy(passwords):
+        raise HashingTimeout("Password hashing timed out")
+
+    monkeypatch.setattr(router_users.password_hasher, "hash_many", busy)
+    admin = UserIdentity(id=1, username="admin", is_admin=True, is_active=True)
+    async with database() as db:
+        result = await router_users.create_users_bulk(make_request(json.dumps([user(0), user(1)]).encode(), "application/json"), admin, db)
+
+    assert [(error.index, error.detail) for error in result.errors] == [
+        (0, "Email or Username already exists"),
+        (1, "Not processed: password hashing is busy"),
+    ]
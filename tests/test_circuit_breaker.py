@@ -0,0 +1,44 @@
+import pytest
+import redis.asyncio as redis
+
+from app.dependencies.__redis__ import CircuitBreaker, RedisUnavailable
+
+def failing(error):
+    async def call():
+        raise error
+    return call
+
+async def ok():
+    return "ok"
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker(failure_threshold=2, window=60, reset_timeout=60, half_open_probes=1)
+
+@pytest.mark.anyio
+async def test_opens_after_connection_errors(breaker):
+    for _ in range(2):
+        with pytest.raises(redis.ConnectionError):
+            await breaker.call(failing(redis.ConnectionError("Connection refused")))
+    assert breaker.state == "open"
+    with pytest.raises(RedisUnavailable):
+        await breaker.call(ok)
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("message", ["No connection available.", "Too many connections"])
+async def test_pool_exhaustion_does_not_count(breaker, message):
+    for _ in range(5):
+        with pytest.raises(redis.ConnectionError):
+            await breaker.call(failing(redis.ConnectionError(message)))
+    assert breaker.state == "closed"
+    assert not breaker.failures
+
+@pytest.mark.anyio
+async def test_server_error_reply_counts_as_success(breaker):
+    with pytest.raises(redis.TimeoutError):
+        await breaker.call(failing(redis.TimeoutError("Timeout reading from socket")))
+    assert len(breaker.failures) == 1
+    with pytest.raises(redis.ResponseError):
+        await breaker.call(failing(redis.ResponseError("WRONGTYPE")))
+    assert breaker.state == "closed"
+    assert not breaker.failures
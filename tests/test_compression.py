@@ -0,0 +1,101 @@
+import gzip
+
+import httpx
+import pytest
+
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+
+from app.dependencies.__compression__ import AdaptiveCompressionMiddleware, compression_level, load_monitor, memo, stats
+from app.dependencies.__config__ import settings
+
+BODY = b'{"users": "' + b"x" * 4096 + b'"}'
+
+@pytest.fixture
+def load(monkeypatch):
+    def set_load(lag: float = 0.0, cpu: float = 0.0):
+        monkeypatch.setattr(load_monitor, "lag", lag)
+        monkeypatch.setattr(load_monitor, "cpu", cpu)
+    set_load()
+    return set_load
+
+@pytest.fixture
+async def client(load):
+    app = FastAPI()
+    app.add_middleware(AdaptiveCompressionMiddleware)
+
+    @app.get("/public")
+    async def public():
+        return Response(BODY, media_type="application/json", headers={"Cache-Control": "public, max-age=60"})
+
+    @app.get("/private")
+    async def private():
+        return Response(BODY, media_type="application/json", headers={"Cache-Control": "private"})
+
+    @app.get("/small")
+    async def small():
+        return Response(b"{}", media_type="application/json")
+
+    @app.get("/encoded")
+    async def encoded():
+        return Response(gzip.compress(BODY), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(3):
+                yield BODY
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    memo.clear()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", headers={"Accept-Encoding": "gzip"}) as client:
+        yield client
+
+def test_level_falls_with_load(load):
+    assert compression_level() == settings.COMPRESSION_MAX_LEVEL
+    load(lag=settings.COMPRESSION_LAG_HIGH * 10)
+    assert compression_level() == settings.COMPRESSION_MIN_LEVEL
+    load(cpu=settings.COMPRESSION_CPU_HIGH / 2)
+    assert compression_level() == round((settings.COMPRESSION_MAX_LEVEL + settings.COMPRESSION_MIN_LEVEL) / 2)
+
+@pytest.mark.anyio
+async def test_cacheable_bodies_are_compressed_once(client, load, monkeypatch):
+    levels = []
+    compress = AdaptiveCompressionMiddleware._compress
+
+    def recording_compress(self, body, level):
+        levels.append(level)
+        return compress(self, body, level)
+
+    monkeypatch.setattr(AdaptiveCompressionMiddleware, "_compress", recording_compress)
+    load(lag=settings.COMPRESSION_LAG_HIGH * 10)
+    hits = stats.memo_hits
+    first = await client.get("/public")
+    second = await client.get("/public")
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.content == second.content == BODY
+    assert stats.memo_hits == hits + 1
+    # Memoized output is produced at the full level even under load
+    assert levels == [settings.COMPRESSION_MAX_LEVEL]
+
+    await client.get("/private")
+    await client.get("/private")
+    assert stats.memo_hits == hits + 1
+    assert levels[1:] == [settings.COMPRESSION_MIN_LEVEL] * 2
+
+@pytest.mark.anyio
+async def test_small_and_already_encoded_bodies_pass_through(client):
+    small = await client.get("/small")
+    assert "content-encoding" not in small.headers
+    assert small.content == b"{}"
+
+    encoded = await client.get("/encoded")
+    assert encoded.headers["content-encoding"] == "gzip"
+    assert encoded.content == BODY
+
+@pytest.mark.anyio
+async def test_streamed_bodies_are_compressed_per_chunk(client):
+    response = await client.get("/stream")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.content == BODY * 3
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.dependencies.__concurrency__ import AdaptiveLimit, Overloaded
+from app.dependencies.__config__ import ConcurrencyGroup
+
+def limit(backoff: float = 0.9, **kwargs) -> AdaptiveLimit:
+    return AdaptiveLimit(ConcurrencyGroup(name="test", routes=[], **kwargs), backoff=backoff)
+
+def test_limit_grows_additively_while_latency_stays_near_the_baseline():
+    group = limit(initial_limit=4)
+    for _ in range(4):
+        group.in_flight += 1
+        group.release(latency=0.01)
+    assert 4.9 < group.limit < 5.1
+
+def test_slow_completion_cuts_the_limit_once_per_baseline_interval():
+    group = limit(initial_limit=10)
+    group.in_flight += 3
+    group.release(latency=1.0)
+    group.release(latency=10.0)
+    group.release(latency=10.0)
+    assert round(group.limit, 2) == round((10 + 1 / 10) * 0.9, 2)
+
+def test_limit_stays_within_its_bounds():
+    group = limit(backoff=0.5, initial_limit=2, min_limit=2, max_limit=3)
+    group.in_flight += 100
+    for _ in range(50):
+        group.release(latency=0.01)
+    assert group.limit == 3
+    group.release(latency=10.0)
+    assert group.limit == 2
+
+@pytest.mark.anyio
+async def test_waiters_get_freed_slots_and_a_full_queue_sheds():
+    group = limit(initial_limit=1, queue_size=1, queue_timeout=1)
+    await group.acquire()
+    waiting = asyncio.create_task(group.acquire())
+    await asyncio.sleep(0)
+    with pytest.raises(Overloaded):
+        await group.acquire()
+
+    group.release()
+    await asyncio.wait_for(waiting, timeout=1)
+    assert group.in_flight == 1
+    assert group.stats()["shed"] == 1
+
+@pytest.mark.anyio
+async def test_queued_request_is_shed_after_the_timeout():
+    group = limit(initial_limit=1, queue_timeout=0.01)
+    await group.acquire()
+    with pytest.raises(Overloaded):
+        await group.acquire()
+    assert not group.waiters
@@ -0,0 +1,82 @@
+import httpx
+import pytest
+
+from fastapi import Depends, FastAPI, Request
+
+from app.dependencies.__database__ import get_db, replica_router, select
+from app.dependencies.__exceptions__ import bad_request, no_content
+from app.models.database.account import Users
+
+@pytest.fixture
+def written(monkeypatch):
+    keys = []
+
+    async def mark_written(key):
+        keys.append(key)
+
+    monkeypatch.setattr(replica_router, "mark_written", mark_written)
+    return keys
+
+@pytest.fixture
+async def client(database):
+    app = FastAPI()
+
+    @app.post("/users")
+    async def create(request: Request, db=Depends(get_db)):
+        user = Users(username="pinned", first_name="A", last_name="B", email="pinned@example.com", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        request.state.principal = f"user:{user.id}"
+        await db.commit()
+        raise no_content("Created")
+
+    @app.post("/rejected")
+    async def rejected(db=Depends(get_db)):
+        raise bad_request("Rejected")
+
+    @app.post("/read-only")
+    async def read_only(db=Depends(get_db)):
+        await db.execute(select(Users.id))
+        await db.commit()
+        return {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+@pytest.mark.anyio
+async def test_committed_write_pins_the_principal_even_when_answered_with_an_exception(client, written):
+    assert (await client.post("/users")).status_code == 204
+    assert len(written) == 1
+    assert written[0].startswith("user:")
+
+@pytest.mark.anyio
+async def test_requests_that_commit_nothing_do_not_pin(client, written):
+    assert (await client.post("/rejected")).status_code == 400
+    assert (await client.post("/read-only")).status_code == 200
+    assert written == []
+
+@pytest.mark.anyio
+async def test_login_does_not_pin_and_later_reads_are_keyed_by_user(database, fake_redis, written, monkeypatch):
+    from app.dependencies.__auth__ import get_password_hash
+    from app.main import get_app
+
+    async with database() as db:
+        db.add(Users(username="reader", first_name="A", last_name="B", email="reader@example.com", is_active=True, hashed_password=await get_password_hash("secret")))
+        await db.commit()
+
+    keys = []
+    session = replica_router.session
+
+    def recording_session(key=None):
+        keys.append(key)
+        return session(key)
+
+    monkeypatch.setattr(replica_router, "session", recording_session)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=get_app()), base_url="http://test") as client:
+        login = await client.post("/auth/token", data={"username": "reader", "password": "secret"})
+        assert login.status_code == 200
+        token = login.json()["access_token"]
+        me = await client.get("/users/", headers={"Authorization": f"Bearer {token}"})
+    assert written == []
+    assert me.status_code == 403, me.text
+    assert keys and all(key.startswith("user:") for key in keys)
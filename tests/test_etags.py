@@ -0,0 +1,61 @@
+import httpx
+import pytest
+
+from fastapi import FastAPI
+
+from app.dependencies.__auth__ import is_active_user
+from app.dependencies.__database__ import AsyncSessionLocal, update
+from app.dependencies.__helpers__ import etag_matches, weak_etag
+from app.models.database.account import Users
+from app.models.pydantic.user import UserIdentity
+from app.routers import router_users
+
+def test_weak_etag_depends_on_every_part():
+    assert weak_etag(1, "a") == weak_etag(1, "a")
+    assert weak_etag(1, "a") != weak_etag(1, "b")
+    assert weak_etag(1, "a").startswith('W/"')
+
+def test_etag_matching_is_weak_and_accepts_lists():
+    etag = weak_etag(1)
+    assert etag_matches(etag, etag)
+    assert etag_matches(etag.removeprefix("W/"), etag)
+    assert etag_matches(f'W/"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('W/"other"', etag)
+    assert not etag_matches(None, etag)
+
+@pytest.fixture
+async def client(database):
+    async with AsyncSessionLocal() as db:
+        user = Users(username="etag-user", first_name="First", last_name="Last", email="etag@example.com", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        user_id = user.id
+        await db.commit()
+
+    app = FastAPI()
+    app.include_router(router_users.router)
+    app.dependency_overrides[is_active_user] = lambda: UserIdentity(id=user_id, username="etag-user", is_admin=True, is_active=True)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client, user_id
+
+async def rename(user_id: int, first_name: str) -> None:
+    # Keeps updated_at unchanged, as two edits within one second would on SQLite
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Users).where(Users.id == user_id).values(first_name=first_name, updated_at=Users.updated_at))
+        await db.commit()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("path", ["/users/{user_id}", "/users/"])
+async def test_edit_within_the_same_second_changes_the_etag(client, path):
+    client, user_id = client
+    url = path.format(user_id=user_id)
+    first = await client.get(url)
+    etag = first.headers["etag"]
+    assert (await client.get(url, headers={"If-None-Match": etag})).status_code == 304
+
+    await rename(user_id, "Renamed")
+    changed = await client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert "Renamed" in changed.text
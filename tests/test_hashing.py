@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.dependencies.__hashing__ import HashingOverloaded, HashingTimeout, PasswordHasher
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(workers=1, max_queue=1, timeout=1)
+    yield hasher
+    hasher.shutdown()
+
+@pytest.mark.anyio
+async def test_calls_beyond_workers_plus_queue_are_rejected(hasher):
+    gate = threading.Event()
+    running = [asyncio.create_task(hasher._run(gate.wait)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    assert hasher.stats()["queue_depth"] == 1
+
+    with pytest.raises(HashingOverloaded):
+        await hasher._run(gate.wait)
+
+    gate.set()
+    assert await asyncio.gather(*running) == [True, True]
+    assert hasher.stats()["rejected"] == 1
+    assert hasher.stats()["completed"] == 2
+
+@pytest.mark.anyio
+async def test_slow_call_times_out_and_frees_its_slot(hasher):
+    hasher.timeout = 0.05
+    gate = threading.Event()
+    try:
+        with pytest.raises(HashingTimeout):
+            await hasher._run(gate.wait)
+    finally:
+        gate.set()
+    assert hasher.stats()["timeouts"] == 1
+    assert hasher._pending == 0
+
+    hasher.timeout = 5
+    hashed_password = await hasher.hash("secret")
+    assert await hasher.verify("secret", hashed_password)
+    assert not await hasher.verify("wrong", hashed_password)
+
+@pytest.mark.anyio
+async def test_hash_many_keeps_the_queue_free_for_other_callers(hasher):
+    hashes = await hasher.hash_many(["a", "b", "c", "d"])
+    assert hasher.stats()["rejected"] == 0
+    assert [await hasher.verify(password, hashed) for password, hashed in zip("abcd", hashes)] == [True] * 4
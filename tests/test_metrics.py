@@ -0,0 +1,41 @@
+from app.dependencies.__cache__ import TTLCache
+from fastapi import FastAPI
+
+from app.dependencies.__metrics__ import publish_cache_stats, register_cache, render_metrics, route_template
+
+def test_cache_counters_are_published_once():
+    cache = TTLCache(maxsize=10, ttl=60)
+    register_cache("test", cache)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+    publish_cache_stats()
+    publish_cache_stats()
+
+    lines = render_metrics().splitlines()
+    assert 'cache_hits_total{cache="test"} 1' in lines
+    assert 'cache_misses_total{cache="test"} 1' in lines
+    assert 'cache_entries{cache="test"} 1' in lines
+
+def test_auth_caches_are_reported():
+    from app.dependencies.__auth__ import token_cache, user_cache
+
+    token_cache.get("missing")
+    user_cache.get("missing")
+    text = render_metrics()
+    assert 'cache_misses_total{cache="tokens"}' in text
+    assert 'cache_misses_total{cache="users"}' in text
+
+def test_route_template_is_matched_once_per_request():
+    app = FastAPI()
+
+    @app.get("/users/{user_id}")
+    async def read_user(user_id: int):
+        return {}
+
+    scope = {"type": "http", "method": "GET", "path": "/users/7", "root_path": "", "app": app}
+    assert route_template(scope) == "/users/{user_id}"
+    assert scope["route_template"] == "/users/{user_id}"
+
+    app.router.routes.clear()
+    assert route_template(scope) == "/users/{user_id}"
@@ -0,0 +1,51 @@
+import pytest
+
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.dependencies.__config__ import Settings, settings
+from app.dependencies.__database__ import create_pooled_engine, pool_stats
+
+@pytest.mark.parametrize("workers, budget", [(1, 10), (4, 80), (9, 100), (64, 80)])
+def test_workers_share_the_connection_budget(workers, budget):
+    config = Settings(WEB_CONCURRENCY=workers, DB_MAX_CONNECTIONS=budget)
+    assert config.db_pool_size >= 1
+    per_worker = config.db_pool_size + config.db_max_overflow
+    assert per_worker == config.db_connections_per_worker
+    # Every worker gets at least two connections, even if that oversubscribes a tiny budget
+    assert per_worker * workers <= max(budget, 2 * workers)
+
+def test_explicit_pool_settings_win():
+    config = Settings(WEB_CONCURRENCY=4, DB_MAX_CONNECTIONS=80, DB_POOL_SIZE=3, DB_MAX_OVERFLOW=0)
+    assert (config.db_pool_size, config.db_max_overflow) == (3, 0)
+
+@pytest.mark.anyio
+async def test_pool_stats_count_checkouts_and_timeouts(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 1)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 0)
+    monkeypatch.setattr(settings, "DB_POOL_TIMEOUT", 0.05)
+    engine = create_pooled_engine(f"sqlite+aiosqlite:///{tmp_path}/pool.db")
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            assert pool_stats(engine)["in_use"] == 1
+            with pytest.raises(PoolTimeoutError):
+                async with engine.connect():
+                    pass
+        stats = pool_stats(engine)
+    finally:
+        await engine.dispose()
+
+    assert stats["size"] == 1
+    assert stats["in_use"] == 0
+    assert stats["checkouts"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["max_wait_ms"] >= 50
+
+@pytest.mark.anyio
+async def test_in_memory_sqlite_is_not_pooled():
+    engine = create_pooled_engine("sqlite+aiosqlite://")
+    try:
+        assert "pool" in pool_stats(engine)
+    finally:
+        await engine.dispose()
@@ -0,0 +1,41 @@
+import pytest
+
+from app.dependencies.__config__ import RateLimitRule
+from app.dependencies.__ratelimit__ import RateLimiter
+
+def scope(ip: str = "10.0.0.1") -> dict:
+    return {"type": "http", "method": "GET", "path": "/anything", "headers": [], "client": (ip, 50000)}
+
+@pytest.mark.anyio
+async def test_gcra_allows_the_burst_then_asks_to_retry(fake_redis):
+    limiter = RateLimiter([RateLimitRule(limit=2, period=60, burst=2)], lease_ttl=1)
+    assert await limiter.check(scope()) == 0
+    assert await limiter.check(scope()) == 0
+    retry_after = await limiter.check(scope())
+    assert 29 < retry_after <= 30
+    assert await limiter.check(scope("10.0.0.2")) == 0
+
+@pytest.mark.anyio
+async def test_denied_client_is_answered_locally_until_it_may_retry(fake_redis):
+    limiter = RateLimiter([RateLimitRule(limit=1, period=60)], lease_ttl=1)
+    await limiter.check(scope())
+    assert await limiter.check(scope()) > 0
+    assert await limiter.check(scope()) > 0
+    assert limiter.stats()["redis_decisions"] == 2
+    assert limiter.stats()["local_decisions"] == 1
+
+@pytest.mark.anyio
+async def test_lease_is_spent_without_reaching_redis(fake_redis):
+    limiter = RateLimiter([RateLimitRule(limit=10, period=60, burst=5, lease=5)], lease_ttl=60)
+    for _ in range(5):
+        assert await limiter.check(scope()) == 0
+    assert limiter.stats()["redis_decisions"] == 1
+    assert limiter.stats()["local_decisions"] == 4
+    assert await limiter.check(scope()) > 0
+
+@pytest.mark.anyio
+async def test_rules_apply_only_to_their_methods(fake_redis):
+    limiter = RateLimiter([RateLimitRule(methods=["POST"], limit=1, period=60)], lease_ttl=1)
+    for _ in range(3):
+        assert await limiter.check(scope()) == 0
+    assert limiter.stats()["redis_decisions"] == 0
@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+
+from app.dependencies.__config__ import settings
+from app.dependencies.__redis__ import RedisClientManager
+
+@pytest.fixture
+async def l1_manager(fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "REDIS_L1_ENABLED", True)
+    monkeypatch.setattr(settings, "REDIS_L1_MODE", "pubsub")
+    manager = RedisClientManager()
+    await manager.init_client()
+    try:
+        yield manager
+    finally:
+        await manager.close_client()
+
+@pytest.mark.anyio
+async def test_pubsub_l1_entry_does_not_outlive_redis_ttl(l1_manager):
+    await l1_manager.client.set("short", "v", px=100)
+    assert await l1_manager.get("short") == b"v"
+    expires_at, _, _ = l1_manager.l1._data["short"]
+    assert expires_at - time.monotonic() <= 0.1
+
+    await asyncio.sleep(0.15)
+    assert await l1_manager.get("short") is None
+
+@pytest.mark.anyio
+async def test_pubsub_l1_entry_without_redis_ttl_uses_l1_ttl(l1_manager):
+    await l1_manager.client.set("forever", "v")
+    await l1_manager.get("forever")
+    expires_at, _, _ = l1_manager.l1._data["forever"]
+    assert expires_at - time.monotonic() > settings.REDIS_L1_TTL - 1
+
+@pytest.mark.anyio
+async def test_tracker_reconnect_leaves_busy_connections_alone(l1_manager):
+    busy = await l1_manager.pool.get_connection("GET")
+    idle = await l1_manager.pool.get_connection("GET")
+    await l1_manager.pool.release(idle)
+
+    task = asyncio.create_task(l1_manager._reconnect_idle_connections())
+    await asyncio.sleep(0.05)
+    assert not task.done()
+    assert busy.is_connected
+    assert not idle.is_connected
+    assert not l1_manager.l1_active
+
+    await l1_manager.pool.release(busy)
+    await asyncio.wait_for(task, timeout=1)
+    assert not busy.is_connected
@@ -0,0 +1,57 @@
+import pytest
+
+from app.dependencies.__refresh__ import RefreshTokenStore
+
+CLAIMS = {"sub": "alice", "userid": 1}
+
+@pytest.fixture
+def store(fake_redis):
+    return RefreshTokenStore(idle_lifetime=3600, max_lifetime=86400)
+
+@pytest.mark.anyio
+async def test_rotation_issues_a_new_token_of_the_same_family(store):
+    token = await store.issue(CLAIMS)
+    new_token, claims = await store.rotate(token)
+    assert claims == CLAIMS
+    assert new_token != token
+    assert new_token.split(".")[0] == token.split(".")[0]
+    assert (await store.rotate(new_token))[1] == CLAIMS
+
+@pytest.mark.anyio
+async def test_replayed_token_revokes_the_family(store):
+    token = await store.issue(CLAIMS)
+    new_token, _ = await store.rotate(token)
+    assert await store.rotate(token) == (None, None)
+    assert await store.rotate(new_token) == (None, None)
+
+@pytest.mark.anyio
+async def test_forged_token_with_a_known_family_is_only_rejected(store):
+    token = await store.issue(CLAIMS)
+    forged = token.split(".")[0] + ".forged"
+    assert await store.rotate(forged) == (None, None)
+    assert not await store.revoke(forged)
+    assert (await store.rotate(token))[1] == CLAIMS
+
+@pytest.mark.anyio
+async def test_revoke_ends_the_family(store):
+    token = await store.issue(CLAIMS)
+    assert await store.revoke(token)
+    assert await store.rotate(token) == (None, None)
+
+@pytest.mark.anyio
+async def test_refresh_for_a_deactivated_cached_user_revokes_the_family(store, monkeypatch):
+    from fastapi import HTTPException, Request
+
+    from app.dependencies import __auth__
+    from app.models.pydantic.user import UserIdentity
+
+    monkeypatch.setattr(__auth__, "refresh_tokens", store)
+    __auth__.user_cache.set("alice", UserIdentity(id=1, username="alice", is_admin=False, is_active=False))
+    try:
+        token = await store.issue(CLAIMS)
+        with pytest.raises(HTTPException) as error:
+            await __auth__.rotate_refresh_token(Request({"type": "http", "headers": []}), token)
+        assert error.value.status_code == 401
+        assert await store._record(token.split(".")[0]) is None
+    finally:
+        __auth__.user_cache.pop("alice")
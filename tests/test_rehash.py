@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from passlib.context import CryptContext
+
+from app.dependencies import __auth__, __hashing__
+from app.dependencies.__auth__ import authenticate_user
+from app.dependencies.__config__ import settings
+from app.dependencies.__hashing__ import calibrate, password_hasher
+from app.models.database.account import Users
+
+OLD_CONTEXT = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4)
+
+@pytest.fixture
+def raised_rounds(monkeypatch):
+    """Raises the configured cost above the 4 rounds the stored hashes were made with."""
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=5, bcrypt__min_rounds=5)
+    monkeypatch.setattr(__hashing__, "bcrypt_context", context)
+    return context
+
+@pytest.fixture
+async def user(database):
+    async with database() as db:
+        user = Users(username="rehash", first_name="A", last_name="B", email="rehash@example.com", is_active=True, hashed_password=OLD_CONTEXT.hash("secret"))
+        db.add(user)
+        await db.flush()
+        user_id = user.id
+        await db.commit()
+    return database, user_id
+
+async def stored_hash(database, user_id: int) -> str:
+    async with database() as db:
+        return (await db.get(Users, user_id)).hashed_password
+
+def test_new_hashes_use_the_configured_rounds():
+    assert __hashing__.bcrypt_context.hash("secret").startswith(f"$2b${settings.BCRYPT_ROUNDS:02d}$")
+
+def test_calibration_stops_at_the_first_cost_over_the_target():
+    recommended, timings = calibrate(target=0.0, samples=1, max_rounds=6)
+    assert recommended == 4
+    assert list(timings) == [4]
+
+def test_only_hashes_below_the_configured_rounds_need_updating(raised_rounds):
+    assert password_hasher.needs_update(OLD_CONTEXT.hash("secret"))
+    assert not password_hasher.needs_update(raised_rounds.hash("secret"))
+
+@pytest.mark.anyio
+async def test_login_upgrades_an_outdated_hash_once(user, raised_rounds):
+    database, user_id = user
+    async with database() as db:
+        assert await authenticate_user(db, "rehash", "secret")
+        assert await authenticate_user(db, "rehash", "secret")
+    assert len(__auth__._pending_rehashes) == 1
+    await asyncio.gather(*__auth__._pending_rehashes.values())
+
+    new_hash = await stored_hash(database, user_id)
+    assert new_hash.startswith("$2b$05$")
+    assert await password_hasher.verify("secret", new_hash)
+    assert not password_hasher.needs_update(new_hash)
+
+@pytest.mark.anyio
+async def test_failed_login_does_not_rehash(user, raised_rounds):
+    database, user_id = user
+    async with database() as db:
+        assert not await authenticate_user(db, "rehash", "wrong")
+    assert not __auth__._pending_rehashes
+    assert (await stored_hash(database, user_id)).startswith("$2b$04$")
+
+@pytest.mark.anyio
+async def test_rehash_does_not_overwrite_a_password_changed_meanwhile(user, raised_rounds):
+    database, user_id = user
+    old_hash = await stored_hash(database, user_id)
+    changed_hash = raised_rounds.hash("changed")
+    async with database() as db:
+        user = await db.get(Users, user_id)
+        user.hashed_password = changed_hash
+        await db.commit()
+
+    await __auth__._rehash_password(user_id, "secret", old_hash)
+    assert await stored_hash(database, user_id) == changed_hash
@@ -0,0 +1,130 @@
+import asyncio
+
+import httpx
+import pytest
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.dependencies.__redis__ import cache_response
+
+@pytest.fixture
+def calls():
+    return {"count": 0}
+
+@pytest.fixture
+def app(calls):
+    app = FastAPI()
+    resource = {"open": False}
+
+    async def get_resource():
+        resource["open"] = True
+        try:
+            yield resource
+        finally:
+            resource["open"] = False
+
+    @app.get("/created")
+    @cache_response(expiration=60)
+    async def created(request: Request):
+        calls["count"] += 1
+        return JSONResponse({"n": calls["count"]}, status_code=201, headers={"Location": "/created/1"})
+
+    @app.get("/page")
+    @cache_response(expiration=60)
+    async def page(request: Request):
+        calls["count"] += 1
+        response = JSONResponse({"n": calls["count"]}, headers={"X-Next-Cursor": "42"})
+        response.set_cookie("session", "secret")
+        return response
+
+    @app.get("/stale")
+    @cache_response(expiration=60, soft_expiration=0.05)
+    async def stale(request: Request, resource: dict = Depends(get_resource)):
+        # A refresh outside the request would find the dependency already torn down
+        assert resource["open"]
+        calls["count"] += 1
+        await asyncio.sleep(0.01)
+        return JSONResponse({"n": calls["count"]})
+
+    @app.get("/slow")
+    @cache_response(expiration=60)
+    async def slow(request: Request):
+        calls["count"] += 1
+        await asyncio.sleep(0.05)
+        return JSONResponse({"n": calls["count"]})
+
+    @app.get("/items")
+    @cache_response(expiration=60, query_params=("page",))
+    async def items(request: Request):
+        calls["count"] += 1
+        return JSONResponse({"n": calls["count"]})
+
+    return app
+
+@pytest.fixture
+async def client(app, fake_redis):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+@pytest.mark.anyio
+async def test_uncacheable_response_keeps_status_and_headers(client, calls):
+    first = await client.get("/created")
+    second = await client.get("/created")
+
+    assert first.status_code == second.status_code == 201
+    assert first.headers["location"] == "/created/1"
+    assert calls["count"] == 2
+
+@pytest.mark.anyio
+async def test_cached_response_keeps_headers_but_not_cookies(client, calls):
+    first = await client.get("/page")
+    second = await client.get("/page")
+
+    assert first.headers["x-next-cursor"] == second.headers["x-next-cursor"] == "42"
+    assert "session=secret" in first.headers["set-cookie"]
+    assert "set-cookie" not in second.headers
+    assert second.json() == first.json()
+    assert calls["count"] == 1
+
+@pytest.mark.anyio
+async def test_concurrent_misses_share_one_handler_call(client, calls):
+    responses = await asyncio.gather(*(client.get("/slow") for _ in range(5)))
+
+    assert {response.json()["n"] for response in responses} == {1}
+    assert calls["count"] == 1
+
+@pytest.mark.anyio
+async def test_stale_entry_is_refreshed_inside_a_request(client, calls):
+    assert (await client.get("/stale")).json() == {"n": 1}
+    await asyncio.sleep(0.1)
+
+    refreshing, concurrent = await asyncio.gather(client.get("/stale"), client.get("/stale"))
+    assert {refreshing.json()["n"], concurrent.json()["n"]} == {1, 2}
+    assert refreshing.status_code == concurrent.status_code == 200
+    assert (await client.get("/stale")).json() == {"n": 2}
+    assert calls["count"] == 2
+
+@pytest.mark.anyio
+async def test_only_listed_query_params_are_part_of_the_key(client, calls):
+    assert (await client.get("/items?page=1&utm=a")).json() == {"n": 1}
+    assert (await client.get("/items?page=1&utm=b")).json() == {"n": 1}
+    assert (await client.get("/items?page=2")).json() == {"n": 2}
+    assert (await client.get("/slow?anything=1")).json() == (await client.get("/slow?anything=2")).json()
+
+@pytest.mark.anyio
+async def test_tag_sets_drop_members_whose_entries_expired(fake_redis):
+    await fake_redis.set_tagged("cache:t:short", b"a", 1, ("user:1",))
+    await asyncio.sleep(1.1)
+    await fake_redis.set_tagged("cache:t:long", b"b", 60, ("user:1",))
+
+    assert await fake_redis.client.zrange("cache:tag:user:1", 0, -1) == [b"cache:t:long"]
+    assert await fake_redis.invalidate_tags("user:1") == 1
+    assert await fake_redis.client.exists("cache:t:long", "cache:tag:user:1") == 0
+
+@pytest.mark.anyio
+async def test_tag_set_lives_as_long_as_its_longest_entry(fake_redis):
+    await fake_redis.set_tagged("cache:t:long", b"a", 60, ("user:1",))
+    await fake_redis.set_tagged("cache:t:short", b"b", 5, ("user:1",))
+
+    assert 55 < await fake_redis.client.ttl("cache:tag:user:1") <= 60
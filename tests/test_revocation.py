@@ -0,0 +1,55 @@
+import json
+import time
+
+import pytest
+
+from app.dependencies.__revocation__ import TokenRevocationList
+
+def revocations() -> TokenRevocationList:
+    return TokenRevocationList(sync_interval=60, max_lifetime=3600)
+
+@pytest.mark.anyio
+async def test_revocation_reaches_a_worker_that_syncs_later(fake_redis):
+    revoking, other = revocations(), revocations()
+    assert not await other.is_revoked("a")
+
+    await revoking.revoke("a", time.time() + 60)
+    assert await revoking.is_revoked("a")
+    # Within the sync interval the other worker relies on pub/sub
+    assert not await other.is_revoked("a")
+    other.next_sync = 0.0
+    assert await other.is_revoked("a")
+
+@pytest.mark.anyio
+async def test_expired_tokens_are_neither_stored_nor_kept(fake_redis):
+    worker = revocations()
+    await worker.revoke("expired", time.time() - 1)
+    assert not await worker.is_revoked("expired")
+    assert await fake_redis.client.zcard(TokenRevocationList.KEY) == 0
+
+    await worker.revoke("short", time.time() + 0.05)
+    time.sleep(0.1)
+    worker.next_sync = 0.0
+    assert not await worker.is_revoked("short")
+
+@pytest.mark.anyio
+async def test_unchanged_revision_skips_reading_the_set(fake_redis, monkeypatch):
+    worker = revocations()
+    await worker.revoke("a", time.time() + 60)
+    await worker.sync()
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("revoked set read although the revision did not move")
+
+    monkeypatch.setattr(fake_redis.client, "zrangebyscore", fail)
+    await worker.sync()
+    assert await worker.is_revoked("a")
+
+def test_published_revocations_apply_and_a_missed_message_forces_a_sync():
+    worker = revocations()
+    worker.next_sync = time.monotonic() + 60
+    worker.handle_message(json.dumps(["a", time.time() + 60]))
+    assert "a" in worker.revoked
+
+    worker.handle_message(None)
+    assert worker.next_sync == 0.0
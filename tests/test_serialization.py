@@ -0,0 +1,42 @@
+import json
+
+import httpx
+import pytest
+
+from fastapi import FastAPI
+
+from app.dependencies.__auth__ import is_active_user
+from app.models.database.account import Users
+from app.models.pydantic.user import USER_PUBLIC_FIELDS, UserIdentity, UserPublic, user_record_adapter, user_records_adapter
+from app.routers import router_users
+
+RECORD = {"username": "alice", "email": "alice@example.com", "first_name": "Alice", "last_name": "Liddell", "id": 7, "is_admin": False, "is_active": True}
+
+def test_public_fields_match_the_response_model_in_order():
+    assert USER_PUBLIC_FIELDS == tuple(UserPublic.model_fields)
+
+def test_record_encodes_exactly_like_the_response_model():
+    expected = UserPublic(**RECORD).model_dump_json().encode()
+    assert user_record_adapter.dump_json(RECORD) == expected
+    assert user_records_adapter.dump_json([RECORD, RECORD]) == b"[" + expected + b"," + expected + b"]"
+
+def test_stored_values_are_sent_without_revalidation():
+    legacy = {**RECORD, "email": "not-an-email"}
+    assert json.loads(user_record_adapter.dump_json(legacy))["email"] == "not-an-email"
+
+@pytest.mark.anyio
+async def test_user_endpoint_sends_the_public_record(database):
+    async with database() as db:
+        user = Users(**{**RECORD, "id": None}, hashed_password="x")
+        db.add(user)
+        await db.flush()
+        record = {**RECORD, "id": user.id}
+        await db.commit()
+
+    app = FastAPI()
+    app.include_router(router_users.router)
+    app.dependency_overrides[is_active_user] = lambda: UserIdentity(id=record["id"], username="alice", is_admin=False, is_active=True)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get(f"/users/{record['id']}")
+    assert response.status_code == 200
+    assert response.content == UserPublic(**record).model_dump_json().encode()
@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import pytest
+
+from fastapi import Request
+
+from app.dependencies import __auth__
+from app.dependencies.__auth__ import USER_INVALIDATION_CHANNEL, create_access_token, get_current_user, invalidate_user, user_cache
+from app.dependencies.__database__ import replica_router
+from app.models.database.account import Users
+from app.models.pydantic.user import UserIdentity
+
+def request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [], "client": ("127.0.0.1", 1234)})
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    user_cache.clear()
+    yield
+    user_cache.clear()
+
+@pytest.mark.anyio
+async def test_repeat_requests_are_answered_from_the_cache(database, monkeypatch):
+    async with database() as db:
+        db.add(Users(username="cached", first_name="A", last_name="B", email="cached@example.com", is_active=True, hashed_password="x"))
+        await db.commit()
+
+    sessions = []
+    session = replica_router.session
+
+    def counting_session(key=None):
+        sessions.append(key)
+        return session(key)
+
+    monkeypatch.setattr(replica_router, "session", counting_session)
+    monkeypatch.setattr(__auth__.revocation_list, "is_revoked", lambda jti: asyncio.sleep(0, result=False))
+    token = create_access_token({"sub": "cached"})
+    hits = user_cache.hits
+
+    first = await get_current_user(request(), token)
+    second = await get_current_user(request(), token)
+    assert first == second
+    assert first.username == "cached" and first.is_active
+    assert len(sessions) == 1
+    assert user_cache.hits == hits + 1
+
+@pytest.mark.anyio
+async def test_invalidation_drops_the_local_entry_and_tells_other_workers(fake_redis):
+    user_cache.set("alice", UserIdentity(id=1, username="alice", is_admin=False, is_active=True))
+    pubsub = fake_redis.client.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(USER_INVALIDATION_CHANNEL)
+    try:
+        await invalidate_user("alice")
+        message = None
+        for _ in range(10):
+            message = message or await pubsub.get_message(timeout=0.1)
+    finally:
+        await pubsub.aclose()
+    assert user_cache.get("alice") is None
+    assert json.loads(message["data"]) == ["alice"]
+
+def test_other_workers_drop_named_users_and_clear_after_missed_messages():
+    for user_id, username in enumerate(["alice", "bob"]):
+        user_cache.set(username, UserIdentity(id=user_id, username=username, is_admin=False, is_active=True))
+
+    __auth__._on_user_invalidation(json.dumps(["alice"]))
+    assert user_cache.get("alice") is None
+    assert user_cache.get("bob") is not None
+
+    __auth__._on_user_invalidation(None)
+    assert len(user_cache) == 0
@@ -0,0 +1,64 @@
+import json
+
+import httpx
+import pytest
+
+from fastapi import FastAPI
+
+from app.dependencies.__auth__ import is_active_user
+from app.dependencies.__config__ import settings
+from app.models.database.account import Users
+from app.models.pydantic.user import USER_PUBLIC_FIELDS, UserIdentity
+from app.routers import router_users
+
+@pytest.fixture
+async def client(database):
+    async with database() as db:
+        db.add_all(Users(username=f"list{index}", first_name="A", last_name="B", email=f"list{index}@example.com", hashed_password="x") for index in range(5))
+        await db.commit()
+
+    app = FastAPI()
+    app.include_router(router_users.router)
+    app.dependency_overrides[is_active_user] = lambda: UserIdentity(id=1, username="admin", is_admin=True, is_active=True)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client, app
+
+@pytest.mark.anyio
+async def test_cursor_walks_every_user_once_in_id_order(client):
+    client, _ = client
+    ids, params = [], {"limit": 2}
+    while True:
+        page = await client.get("/users/", params=params)
+        assert page.status_code == 200
+        assert len(page.json()) <= 2
+        ids += [user["id"] for user in page.json()]
+        if "x-next-cursor" not in page.headers:
+            break
+        assert page.headers["x-next-cursor"] == str(ids[-1])
+        params["after"] = page.headers["x-next-cursor"]
+    assert len(ids) == 5
+    assert ids == sorted(set(ids))
+
+@pytest.mark.anyio
+async def test_page_size_is_capped(client):
+    client, _ = client
+    response = await client.get("/users/", params={"limit": settings.USERS_MAX_PAGE_SIZE + 1})
+    assert response.status_code == 422
+
+@pytest.mark.anyio
+async def test_export_streams_one_public_record_per_line(client, monkeypatch):
+    client, _ = client
+    monkeypatch.setattr(settings, "USERS_EXPORT_CHUNK_SIZE", 2)
+    async with client.stream("GET", "/users/export") as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) async for line in response.aiter_lines() if line]
+    assert [user["username"] for user in lines] == [f"list{index}" for index in range(5)]
+    assert all(set(user) == set(USER_PUBLIC_FIELDS) for user in lines)
+
+@pytest.mark.anyio
+async def test_listing_and_export_are_for_administrators_only(client):
+    client, app = client
+    app.dependency_overrides[is_active_user] = lambda: UserIdentity(id=1, username="user", is_admin=False, is_active=True)
+    assert (await client.get("/users/")).status_code == 403
+    assert (await client.get("/users/export")).status_code == 403